@@ -0,0 +1,72 @@
+import queue
+import threading
+import numpy as np
+
+
+class AsyncVideoWriter:
+    """Class encoding frames on a background thread with the wrapped video writer.
+
+    Frames are copied into a fixed amount of preallocated buffers, so the caller can reuse its frame
+    right after write(). When all buffers are waiting for the encoder, write() blocks until one is encoded.
+    An error of the wrapped writer (e.g. a full disk) is raised by the next write() or by release().
+    """
+
+    def __init__(self, video_writer, queue_size=8):
+        self.video_writer = video_writer
+        self.queue_size = queue_size
+        self._free_buffers = queue.Queue()
+        self._buffers_amount = 0
+        # the frames waiting for the encoder, None stops the encoding thread
+        self._pending = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._encode, name='video-writer', daemon=True)
+        self._thread.start()
+
+    def isOpened(self):
+        return self._error is None and self.video_writer.isOpened()
+
+    def _encode(self):
+        while True:
+            frame = self._pending.get()
+            if frame is None:
+                return
+            if self._error is None:
+                try:
+                    self.video_writer.write(frame)
+                except Exception as e:
+                    # keep taking frames so the caller isn't blocked, they will never be encoded
+                    self._error = e
+            self._free_buffers.put(frame)
+
+    def _get_buffer(self, frame):
+        if self._buffers_amount < self.queue_size:
+            try:
+                return self._free_buffers.get_nowait()
+            except queue.Empty:
+                self._buffers_amount += 1
+                return np.empty_like(frame)
+        return self._free_buffers.get()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise IOError(f"Video can't be written: {self._error}") from self._error
+
+    def write(self, frame):
+        self._raise_error()
+        buffer = self._get_buffer(frame)
+        if buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        self._pending.put(buffer)
+
+    def release(self):
+        """Wait until all written frames are encoded and release the wrapped writer."""
+        if self._thread is None:
+            return
+        self._pending.put(None)
+        self._thread.join()
+        self._thread = None
+        try:
+            self.video_writer.release()
+        finally:
+            self._raise_error()
@@ -0,0 +1,49 @@
+from Drawer import Drawer
+from PhaseQualifier import PhaseQualifier
+from ResultsDrawer import ResultsDrawer
+
+
+class Athlete:
+    """Class keeping the pull ups state of one tracked athlete: their phase qualifier, rep events and info panel."""
+
+    def __init__(self, track_id, phase_qualifier: PhaseQualifier, fps):
+        """
+        :param track_id: the athlete's id given by the tracker
+        :param phase_qualifier: a phase qualifier used only by this athlete
+        :param fps: the video fps (for the panel animations and timer)
+        """
+        self.track_id = track_id
+        self.phase_qualifier = phase_qualifier
+        self.events_labels = []
+        self._drawer = ResultsDrawer(fps, phase_qualifier.phases)
+        self._prev_clean_reps_amount = 0
+        self._prev_unclean_reps_amount = 0
+
+    def qualify(self, points, event_time):
+        """Qualify the athlete's state, a rep finished on this frame is labeled with the event time."""
+        self.phase_qualifier.qualify_state(points)
+        if self._prev_clean_reps_amount != self.phase_qualifier.clean_repeats:
+            self.events_labels.append((event_time, True))
+            self._prev_clean_reps_amount = self.phase_qualifier.clean_repeats
+        elif self._prev_unclean_reps_amount != self.phase_qualifier.unclean_repeats:
+            self.events_labels.append((event_time, False))
+            self._prev_unclean_reps_amount = self.phase_qualifier.unclean_repeats
+
+    def render(self, frame, points, required_pairs, panel_x):
+        """Put the athlete's panel, skeleton and id on the frame.
+
+        :param panel_x: the left border of the athlete's info panel
+        :return: the frame
+        """
+        self._drawer.display_info(frame, self.phase_qualifier, panel_x)
+        self._drawer.display_skeleton(frame, points, required_pairs)
+        self._drawer.draw_line_between_wrists(frame, points)
+        self._drawer.draw_chin_point(frame, self.phase_qualifier)
+        self.draw_id(frame, points)
+        return frame
+
+    def draw_id(self, frame, points):
+        label_point = points['Neck'] or points['Nose']
+        if label_point:
+            Drawer.print_message_with_text_edging(frame, label_point[0] + 15, label_point[1] - 15,
+                                                  f'#{self.track_id}')
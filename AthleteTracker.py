@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class AthleteTracker:
+    """Class associating people found on consecutive frames by the centroids of their key points.
+
+    Every person is matched to the nearest track which is closer than max_distance_ratio of the person's height,
+    the nearest pairs are matched first. It's a (tracks, people) distance matrix per frame, so it costs
+    next to nothing for a few athletes. A track which isn't matched for more than max_missed_frames is dropped,
+    a person who isn't matched to any track starts a new one.
+    """
+
+    def __init__(self, max_missed_frames, max_distance_ratio=0.3):
+        """
+        :param max_missed_frames: the amount of frames a track is kept without a matched person
+        :param max_distance_ratio: the max centroid shift between frames as a share of the person's height
+        """
+        self.max_missed_frames = max_missed_frames
+        self.max_distance_ratio = max_distance_ratio
+        self._track_ids = []
+        self._centroids = np.empty((0, 2))
+        self._missed_frames = np.empty(0, int)
+        self._next_track_id = 1
+
+    @staticmethod
+    def get_centroids(people_keypoints):
+        """Return centroids and heights of found key points of every person.
+
+        :param people_keypoints: a (people, 25, 3) array of OpenPose key points
+        :return: (people, 2) centroids, heights and a mask of people having found key points
+        """
+        found = people_keypoints[..., 2] > 0
+        found_amounts = found.sum(axis=1)
+        has_points = found_amounts > 0
+        centroids = (people_keypoints[..., :2] * found[..., None]).sum(axis=1) / np.maximum(found_amounts, 1)[:, None]
+        ys = people_keypoints[..., 1]
+        heights = np.where(found, ys, -np.inf).max(axis=1) - np.where(found, ys, np.inf).min(axis=1)
+        heights[~has_points] = 0
+        return centroids, np.maximum(heights, 1), has_points
+
+    def update(self, people_keypoints):
+        """Match people found on the next frame to the tracks.
+
+        :param people_keypoints: a (people, 25, 3) array of OpenPose key points
+        :return: a list of track ids in the order of people, None for people without found key points
+        """
+        centroids, heights, has_points = self.get_centroids(np.asarray(people_keypoints).reshape(-1, 25, 3))
+        people_track_ids = [None] * len(centroids)
+        matched_tracks = np.zeros(len(self._track_ids), bool)
+        if len(self._track_ids) and has_points.any():
+            distances = np.linalg.norm(self._centroids[:, None] - centroids[None], axis=2)
+            distances[(distances > self.max_distance_ratio * heights) | ~has_points] = np.inf
+            for flat_index in np.argsort(distances, axis=None):
+                track_num, person_num = np.unravel_index(flat_index, distances.shape)
+                if not np.isfinite(distances[track_num, person_num]):
+                    break
+                if matched_tracks[track_num] or people_track_ids[person_num] is not None:
+                    continue
+                matched_tracks[track_num] = True
+                people_track_ids[person_num] = self._track_ids[track_num]
+                self._centroids[track_num] = centroids[person_num]
+
+        self._missed_frames[matched_tracks] = 0
+        self._missed_frames[~matched_tracks] += 1
+        kept_tracks = self._missed_frames <= self.max_missed_frames
+        self._track_ids = [track_id for track_id, is_kept in zip(self._track_ids, kept_tracks) if is_kept]
+        self._centroids = self._centroids[kept_tracks]
+        self._missed_frames = self._missed_frames[kept_tracks]
+
+        for person_num in np.flatnonzero(has_points):
+            if people_track_ids[person_num] is None:
+                people_track_ids[person_num] = self._next_track_id
+                self._track_ids.append(self._next_track_id)
+                self._centroids = np.vstack([self._centroids, centroids[person_num]])
+                self._missed_frames = np.append(self._missed_frames, 0)
+                self._next_track_id += 1
+        return people_track_ids
+
+    def get_centroid(self, track_id):
+        """Return the last centroid of an active track."""
+        return self._centroids[self._track_ids.index(track_id)]
@@ -1,4 +1,8 @@
+import subprocess
+import tempfile
+import numpy as np
 from moviepy.editor import *
+from moviepy.config import get_setting
 
 
 class AudioProcessor:
@@ -13,34 +17,124 @@ class AudioProcessor:
         self._video = None
         self._audio_fps = None
         self._get_audio()
-        self.clean_rep_event_audio = AudioFileClip(os.path.join(AudioProcessor.sounds_dir, 'Complete_event.wav'))
-        self.unclean_rep_event_audio = AudioFileClip(os.path.join(AudioProcessor.sounds_dir, 'Fail_event.wav'))
+        self.clean_rep_event_audio = self._decode_event_audio(
+            os.path.join(AudioProcessor.sounds_dir, 'Complete_event.wav'))
+        self.unclean_rep_event_audio = self._decode_event_audio(
+            os.path.join(AudioProcessor.sounds_dir, 'Fail_event.wav'))
+        # (start sample, samples) pairs which are mixed into the background audio in one pass
+        self._events = []
 
     def _get_audio(self):
         self._video = VideoFileClip(self._input_source_video)
         self._audio = self._video.audio
         self._audio_fps = self._audio.fps
 
+    def _decode_event_audio(self, file_name):
+        """Decode an event sound to float samples having the sample rate and channels of the background audio.
+
+        The file is decoded sequentially by ffmpeg, which is sample-exact unlike moviepy's seeking reader.
+        """
+        nchannels = self._audio.nchannels
+        command = [get_setting('FFMPEG_BINARY'), '-loglevel', 'error', '-i', file_name,
+                   '-f', 'f32le', '-ar', f'{self._audio_fps}', '-ac', f'{nchannels}', '-']
+        decoder = subprocess.run(command, stdout=subprocess.PIPE)
+        if decoder.returncode:
+            raise IOError(f"ffmpeg failed to decode {file_name}.")
+        return np.frombuffer(decoder.stdout, np.float32).reshape(-1, nchannels)
+
     def add_background_audio(self):
-        video = VideoFileClip(self._input_source_processed_video)
-        video = video.set_duration(self._audio.duration, change_end=False)
-        video = video.set_audio(self._audio)
-        video.write_videofile(self._output_source_video, audio=True, codec='libx264')
+        """Mux the mixed audio with the processed video.
 
-        self.close_resources()
-        video.reader.close()
-        video.close()
+        The processed video is already H.264 encoded, so its stream is copied as is and only the audio is encoded.
+        The mixed audio is piped to ffmpeg as raw PCM, so no intermediate audio file is written.
+        The video is muxed into a temporary file which is renamed into place only when it's complete,
+        so an interrupted mux never leaves a partial output video.
+        """
+        nchannels = self._audio.nchannels
+        output_file_name, output_file_extension = os.path.splitext(self._output_source_video)
+        # the extension is kept, ffmpeg chooses the container by it
+        partial_output_file_name = f'{output_file_name}.partial{output_file_extension}'
+        command = [get_setting('FFMPEG_BINARY'), '-y', '-loglevel', 'error',
+                   '-i', self._input_source_processed_video,
+                   '-f', 's16le', '-ar', f'{self._audio_fps}', '-ac', f'{nchannels}', '-i', '-',
+                   '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy', '-c:a', 'aac', partial_output_file_name]
+        # ffmpeg messages go to a file rather than a pipe, so a chatty ffmpeg can't block while it's fed
+        with tempfile.TemporaryFile() as muxer_errors:
+            muxer = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=muxer_errors)
+            try:
+                for chunk in self._iter_mixed_chunks():
+                    muxer.stdin.write(chunk.tobytes())
+            except BrokenPipeError:
+                # ffmpeg has exited early, its return code and messages tell why
+                pass
+            finally:
+                try:
+                    muxer.stdin.close()
+                except BrokenPipeError:
+                    pass
+                return_code = muxer.wait()
+                self.close_resources()
+            muxer_errors.seek(0)
+            errors = muxer_errors.read().decode(errors='replace').strip()
+        if return_code:
+            if os.path.isfile(partial_output_file_name):
+                os.remove(partial_output_file_name)
+            raise IOError(f"ffmpeg failed to mux the audio into {self._output_source_video} "
+                          f"(return code {return_code}): {errors}")
+        os.replace(partial_output_file_name, self._output_source_video)
+        os.remove(self._input_source_processed_video)
 
     def add_event(self, event_type, event_time):
         if event_type == "Complete":
-            event_audio = self.clean_rep_event_audio
+            event_samples = self.clean_rep_event_audio
         else:
-            event_audio = self.unclean_rep_event_audio
-        self._audio = CompositeAudioClip([self._audio, event_audio.set_start(event_time)])
+            event_samples = self.unclean_rep_event_audio
+        self._events.append((int(round(event_time * self._audio_fps)), event_samples))
+
+    def _iter_background_chunks(self, chunk_duration=1):
+        """Yield the background audio as float chunks followed by silence up to the end of the last event,
+        so events after the end of the background audio are heard too."""
+        samples_amount = 0
+        for chunk in self._audio.iter_chunks(chunk_duration=chunk_duration, fps=self._audio_fps):
+            chunk = chunk.reshape(len(chunk), -1)
+            samples_amount += len(chunk)
+            yield chunk
+        events_end = max((event_start + len(event_samples) for event_start, event_samples in self._events), default=0)
+        chunk_size = int(chunk_duration * self._audio_fps)
+        while samples_amount < events_end:
+            chunk = np.zeros((min(chunk_size, events_end - samples_amount), self._audio.nchannels))
+            samples_amount += len(chunk)
+            yield chunk
+
+    def _iter_mixed_chunks(self, chunk_duration=1):
+        """Yield the background audio with all event sounds mixed in as 16-bit PCM chunks.
+
+        Every event is added only to the chunks it overlaps at its exact sample offset,
+        so the mixing cost grows linearly with the number of events.
+        """
+        events = sorted(self._events, key=lambda event: event[0])
+        next_event = 0
+        playing_events = []
+        chunk_start = 0
+        for chunk in self._iter_background_chunks(chunk_duration):
+            chunk_end = chunk_start + len(chunk)
+            while next_event < len(events) and events[next_event][0] < chunk_end:
+                playing_events.append(events[next_event])
+                next_event += 1
+            for event_start, event_samples in playing_events:
+                begin = max(event_start, chunk_start)
+                end = min(event_start + len(event_samples), chunk_end)
+                chunk[begin - chunk_start:end - chunk_start] += event_samples[begin - event_start:end - event_start]
+            playing_events = [event for event in playing_events if event[0] + len(event[1]) > chunk_end]
+            chunk_start = chunk_end
+            yield self.quantize(chunk)
+
+    @staticmethod
+    def quantize(samples):
+        """Convert float samples to 16-bit PCM the same way moviepy does."""
+        return (32767 * np.clip(samples, -0.99, 0.99)).astype(np.int16)
 
     def close_resources(self):
-        self.clean_rep_event_audio.close()
-        self.unclean_rep_event_audio.close()
         self._video.reader.close()
         self._audio.close()
         self._video.close()
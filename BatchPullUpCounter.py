@@ -0,0 +1,136 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PullUpCounter import PullUpCounter
+
+
+def _process_video(input_file, output_dir, use_raw_data):
+    """Run the pull ups counter on one video in a worker process.
+
+    :return: the input file name, processing time in seconds and an error message (None on success)
+    """
+    args = [input_file, output_dir, '--headless']
+    if use_raw_data:
+        args += ['--use-raw-data', 'True']
+    t = time.time()
+    try:
+        PullUpCounter(args).start()
+    except Exception as e:
+        return input_file, time.time() - t, f'{type(e).__name__}: {e}'
+    return input_file, time.time() - t, None
+
+
+class BatchPullUpCounter:
+    """Class launching the pull ups counter on many videos in parallel worker processes."""
+
+    VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+    def __init__(self):
+        self.input_files = []
+        self.output_dir = ""
+        self.input_root_dir = ""
+        self.use_raw_data = False
+        self.workers = 1
+        self.force = False
+        self.parse_cmd_line()
+
+    def parse_cmd_line(self):
+        """Extract arguments from the command line."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument('input', help='directory containing source videos (and their json data directories) '
+                                          'or a glob pattern matching source videos')
+        parser.add_argument('output_dir', help='directory in which will be saved the final videos, '
+                                              'in subdirectories mirroring the directories of the source videos')
+        parser.add_argument('--use-raw-data', dest='use_raw_data', action='store_true',
+                            help='use json-data from the <video name>_json directories instead of OpenPose')
+        parser.add_argument('--workers', type=int, default=1, help='amount of videos processed simultaneously')
+        parser.add_argument('--force', action='store_true', help='process videos whose outputs are up to date too')
+        args = parser.parse_args()
+
+        self.use_raw_data = args.use_raw_data
+        self.force = args.force
+        if args.workers < 1:
+            raise ValueError("Workers amount must be a positive number.")
+        self.workers = args.workers
+        self.output_dir = args.output_dir
+        if not os.path.isdir(self.output_dir):
+            raise FileNotFoundError("Output directory not found.")
+        self.input_files = self.find_input_files(args.input)
+        if not self.input_files:
+            raise FileNotFoundError("No input videos found.")
+        self.input_root_dir = os.path.commonpath([os.path.dirname(os.path.abspath(input_file))
+                                                  for input_file in self.input_files])
+
+    @staticmethod
+    def find_input_files(input_pattern):
+        if os.path.isdir(input_pattern):
+            file_names = (os.path.join(input_pattern, f_name) for f_name in os.listdir(input_pattern))
+            return sorted(f_name for f_name in file_names
+                          if os.path.isfile(f_name) and f_name.lower().endswith(BatchPullUpCounter.VIDEO_EXTENSIONS))
+        return sorted(f_name for f_name in glob.glob(input_pattern) if os.path.isfile(f_name))
+
+    def get_video_output_dir(self, input_file):
+        """Return the output directory of a video, the directories of the input videos are mirrored in it,
+        so videos with the same name from different directories don't overwrite each other."""
+        input_dir = os.path.relpath(os.path.dirname(os.path.abspath(input_file)), self.input_root_dir)
+        return os.path.normpath(os.path.join(self.output_dir, input_dir))
+
+    def is_output_up_to_date(self, input_file, json_dir):
+        """Define whether the output video is newer than its source video and json data.
+
+        The output video is renamed into place only when it's complete, so a partial one isn't found.
+        """
+        output_file = os.path.join(self.get_video_output_dir(input_file), os.path.basename(input_file))
+        if not os.path.isfile(output_file):
+            return False
+        sources_mtime = os.path.getmtime(input_file)
+        if json_dir:
+            sources_mtime = max(sources_mtime, os.path.getmtime(json_dir))
+        return os.path.getmtime(output_file) >= sources_mtime
+
+    def start(self):
+        summary = []
+        videos_to_process = []
+        for input_file in self.input_files:
+            json_dir = PullUpCounter.find_json_dir_by_video_name(input_file) if self.use_raw_data else None
+            if self.use_raw_data and not json_dir:
+                summary.append((input_file, 0, 'skipped: json directory not found'))
+            elif not self.force and self.is_output_up_to_date(input_file, json_dir):
+                summary.append((input_file, 0, 'skipped: up to date'))
+            else:
+                videos_to_process.append(input_file)
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            futures = []
+            for input_file in videos_to_process:
+                video_output_dir = self.get_video_output_dir(input_file)
+                os.makedirs(video_output_dir, exist_ok=True)
+                futures.append(executor.submit(_process_video, input_file, video_output_dir, self.use_raw_data))
+            for future in as_completed(futures):
+                input_file, elapsed_time, error = future.result()
+                status = f'failed: {error}' if error else 'done'
+                print(f'{self.get_video_name(input_file)}: {status} ({elapsed_time:.3} sec)')
+                summary.append((input_file, elapsed_time, status))
+        self.print_summary(summary)
+
+    def get_video_name(self, input_file):
+        """Return the video file name relative to the common directory of all input videos."""
+        return os.path.relpath(os.path.abspath(input_file), self.input_root_dir)
+
+    def print_summary(self, summary):
+        print('\nSummary:')
+        name_width = max(len(self.get_video_name(input_file)) for input_file, _, _ in summary)
+        for input_file, elapsed_time, status in sorted(summary):
+            print(f'{self.get_video_name(input_file):<{name_width}}  {elapsed_time:>8.1f} sec  {status}')
+        processed_time = sum(elapsed_time for _, elapsed_time, status in summary if status == 'done')
+        print(f'{sum(status == "done" for _, _, status in summary)} of {len(summary)} videos are processed, '
+              f'{processed_time:.1f} sec of processing in total.')
+
+
+if __name__ == '__main__':
+    batch_pull_up_counter = BatchPullUpCounter()
+    t = time.time()
+    batch_pull_up_counter.start()
+    print(f'Execution time: {time.time() - t:.3} sec')
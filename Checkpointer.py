@@ -0,0 +1,44 @@
+import os
+import pickle
+
+
+class Checkpointer:
+    """Class saving the processing state of a video, so an interrupted run can resume from the last checkpoint.
+
+    A checkpoint is pickled into a temporary file which is renamed into place, so a crash while saving
+    leaves the previous checkpoint intact. It's resumed only by a run with the same input video
+    (its size and modification time) and the same processing options.
+    """
+
+    def __init__(self, file_name, input_file_name, options, interval=60):
+        """
+        :param file_name: the checkpoint file name
+        :param input_file_name: the processed video
+        :param options: a dict of the processing options a resumed run must have
+        :param interval: the amount of video seconds between checkpoints
+        """
+        self.file_name = file_name
+        input_stat = os.stat(input_file_name)
+        self.fingerprint = {'input_size': input_stat.st_size, 'input_mtime': input_stat.st_mtime_ns,
+                            'options': options}
+        self.interval = interval
+
+    def save(self, state):
+        with open(f'{self.file_name}.tmp', 'wb') as checkpoint_data:
+            pickle.dump({'fingerprint': self.fingerprint, 'state': state}, checkpoint_data, pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{self.file_name}.tmp', self.file_name)
+
+    def load(self):
+        """Return the state saved by an interrupted run of the same video, None if there is no such checkpoint."""
+        if not os.path.isfile(self.file_name):
+            return None
+        with open(self.file_name, 'rb') as checkpoint_data:
+            checkpoint = pickle.load(checkpoint_data)
+        if checkpoint['fingerprint'] != self.fingerprint:
+            print(f"{self.file_name} is made for another video or options, the video is processed from the beginning.")
+            return None
+        return checkpoint['state']
+
+    def remove(self):
+        if os.path.isfile(self.file_name):
+            os.remove(self.file_name)
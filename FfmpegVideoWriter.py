@@ -0,0 +1,44 @@
+import subprocess
+from fractions import Fraction
+import numpy as np
+from moviepy.config import get_setting
+
+
+class FfmpegVideoWriter:
+    """Class encoding frames to H.264 by piping raw frames to a local ffmpeg process.
+
+    It has the same write/release interface as cv2.VideoWriter, so frames are encoded only once
+    and the final audio muxing can copy the video stream instead of re-encoding it.
+    """
+
+    def __init__(self, output_file_name, fps, frame_size, codec='libx264', preset='veryfast', crf=18):
+        width, height = frame_size
+        # the exact rate of NTSC-like fps (e.g. 30000/1001 reported as 29.97002997) keeps the output in sync
+        # with the source audio, a rounded float one drifts
+        frame_rate = Fraction(fps).limit_denominator(1001)
+        command = [get_setting('FFMPEG_BINARY'), '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}',
+                   '-r', f'{frame_rate.numerator}/{frame_rate.denominator}', '-i', '-',
+                   '-an', '-c:v', codec, '-preset', preset, '-crf', f'{crf}', '-pix_fmt', 'yuv420p',
+                   output_file_name]
+        self.output_file_name = output_file_name
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def isOpened(self):
+        return self._process is not None and self._process.poll() is None
+
+    def write(self, frame):
+        try:
+            # write the frame buffer itself instead of a bytes copy of it
+            self._process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise IOError(f"ffmpeg has stopped encoding {self.output_file_name}.")
+
+    def release(self):
+        if self._process is None:
+            return
+        self._process.stdin.close()
+        return_code = self._process.wait()
+        self._process = None
+        if return_code:
+            raise IOError(f"ffmpeg failed to encode {self.output_file_name} (exit code {return_code}).")
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+
+class FrameSource:
+    """Class decoding video frames on a background thread into a ring buffer of preallocated frame arrays.
+
+    It's read like cv2.VideoCapture: read() returns has_frame and frame. Frames are decoded in place,
+    so a returned frame stays unchanged only while it's one of the last kept frames (see keep_frames).
+    """
+
+    def __init__(self, file_name, prefetch=8, profiler=None):
+        """
+        :param prefetch: the amount of frames decoded ahead of the reader
+        :param profiler: a profiler recording the decoding time of every frame as the 'decode_thread' stage
+        """
+        self.file_name = file_name
+        self.cap = cv2.VideoCapture(file_name)
+        self.prefetch = prefetch
+        self.profiler = profiler
+        self._kept_frames_amount = 1
+        self._frames = []
+        # indexes of decoded frames waiting for the reader, None marks the end of the video
+        self._decoded = deque()
+        self._free = deque()
+        self._kept = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self._error = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def get(self, prop_id):
+        return self.cap.get(prop_id)
+
+    def keep_frames(self, amount):
+        """Keep the last read frames unchanged until the given amount of newer frames is read.
+
+        It's needed when the reader holds several frames at once (e.g. to pass them to OpenPose together).
+        It has to be called before reading starts (or after seek).
+        """
+        if self._thread is not None:
+            raise ValueError("The amount of kept frames can't be changed while frames are decoded.")
+        if amount < 1:
+            raise ValueError("The amount of kept frames must be a positive number.")
+        self._kept_frames_amount = amount
+
+    def seek(self, frame_num):
+        """Continue reading from the given frame number (0 is the first frame).
+
+        Seeking isn't frame-accurate for all codecs, so the position the backend has reached is read back
+        and if it isn't the required one, the video is reopened and frames are grabbed up to the required one.
+        """
+        self._stop_decoding()
+        if frame_num and self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num) and \
+                int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_num:
+            return
+        self.cap.release()
+        self.cap = cv2.VideoCapture(self.file_name)
+        for _ in range(frame_num):
+            if not self.cap.grab():
+                raise IOError(f"{self.file_name} has less than {frame_num} frames.")
+
+    def _start_decoding(self):
+        buffer_size = self._kept_frames_amount + self.prefetch
+        if len(self._frames) != buffer_size:
+            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self._frames = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(buffer_size)]
+        self._decoded.clear()
+        self._kept.clear()
+        self._free = deque(range(buffer_size))
+        self._stop = False
+        self._error = None
+        self._thread = threading.Thread(target=self._decode, name='frame-source', daemon=True)
+        self._thread.start()
+
+    def _stop_decoding(self):
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stop = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def _decode(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._free and not self._stop:
+                        self._condition.wait()
+                    if self._stop:
+                        return
+                    index = self._free.popleft()
+                t = time.perf_counter()
+                has_frame, frame = self.cap.read(self._frames[index])
+                if self.profiler:
+                    self.profiler.add('decode_thread', t, time.perf_counter() - t)
+                if has_frame:
+                    # the frame is decoded into a new array if its size differs from the preallocated one
+                    self._frames[index] = frame
+                with self._condition:
+                    self._decoded.append(index if has_frame else None)
+                    self._condition.notify_all()
+                if not has_frame:
+                    return
+        except Exception as e:
+            with self._condition:
+                self._error = e
+                self._decoded.append(None)
+                self._condition.notify_all()
+
+    def read(self):
+        """Return whether the next frame is read and the frame (None at the end of the video)."""
+        if self._thread is None:
+            self._start_decoding()
+        with self._condition:
+            while not self._decoded:
+                self._condition.wait()
+            index = self._decoded[0]
+            if index is None:
+                if self._error is not None:
+                    raise IOError(f"{self.file_name} can't be decoded: {self._error}")
+                return False, None
+            self._decoded.popleft()
+            self._kept.append(index)
+            if len(self._kept) > self._kept_frames_amount:
+                self._free.append(self._kept.popleft())
+                self._condition.notify_all()
+        return True, self._frames[index]
+
+    def release(self):
+        self._stop_decoding()
+        self.cap.release()
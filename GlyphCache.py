@@ -0,0 +1,49 @@
+import os
+import cv2
+import numpy as np
+
+
+class GlyphCache:
+    """Class keeping phase icons decoded and resized for the overlay.
+
+    Icons are loaded only once when the cache is created, so a missing icon is reported once
+    instead of on every frame.
+    """
+
+    def __init__(self, phases, size, alpha, icons_dir='icons'):
+        self.phases = phases
+        self.size = size
+        self.alpha = alpha
+        self.icons_dir = icons_dir
+        self._glyphs = {}
+        for phase in phases:
+            icon_name = os.path.join(icons_dir, f'{phase}.png')
+            pictogram = cv2.imread(icon_name) if os.path.isfile(os.path.abspath(icon_name)) else None
+            if pictogram is None:
+                print(f"{icon_name} isn't found.")
+                continue
+            pictogram = cv2.resize(pictogram, (size, size), interpolation=cv2.INTER_AREA)
+            # the icon lies on a black rectangle which (as cv2.rectangle does) includes its bottom-right border
+            glyph = np.zeros((size + 1, size + 1, 3), np.uint8)
+            glyph[:size, :size] = pictogram
+            self._glyphs[phase] = glyph
+
+    def __getstate__(self):
+        # the glyphs are pickled (e.g. in a checkpoint) as the parameters they are built from
+        return self.phases, self.size, self.alpha, self.icons_dir
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def has_glyph(self, phase):
+        return phase in self._glyphs
+
+    def blend(self, region, phase):
+        """Blend the phase icon with the region of a frame.
+
+        :param region: a frame region of the glyph size (including the rectangle border)
+        :param phase: a phase name the icon is chosen by
+        :return: a blended region
+        """
+        # the operands keep the order of the former full frame blending, so the pixels are rounded the same way
+        return cv2.addWeighted(self._glyphs[phase], self.alpha, region, 1 - self.alpha, 0)
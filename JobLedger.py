@@ -0,0 +1,86 @@
+import sqlite3
+import time
+
+
+class JobLedger:
+    """Class recording the processing state of every video in a small local SQLite database.
+
+    Every process has to create its own JobLedger instance since SQLite connections
+    can't be shared between processes. Videos are known by their file names, the size and modification time
+    of a queued file tell whether it's the same video or a new one with the name of an earlier video.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._connection = sqlite3.connect(file_name, timeout=60, isolation_level=None)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS jobs (video TEXT PRIMARY KEY, state TEXT NOT NULL, '
+                                 'attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated REAL NOT NULL, '
+                                 'size INTEGER, mtime INTEGER)')
+        # ledgers made before the files were recorded get the columns, their rows have no size and mtime
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(jobs)')]
+        for column in ('size', 'mtime'):
+            if column not in columns:
+                self._connection.execute(f'ALTER TABLE jobs ADD COLUMN {column} INTEGER')
+
+    def add(self, video, size, mtime):
+        """Queue a video unless the same file is already known to the ledger.
+
+        A known video whose file has changed (e.g. a new video named like a done one) is queued again
+        from scratch.
+        :param size: the video file size
+        :param mtime: the video file modification time in ns
+        :return: whether the video is queued again because its file has changed
+        """
+        row = self._connection.execute('SELECT state, size, mtime FROM jobs WHERE video = ?', (video,)).fetchone()
+        if row is None:
+            self._connection.execute('INSERT INTO jobs (video, state, updated, size, mtime) VALUES (?, ?, ?, ?, ?)',
+                                     (video, JobLedger.QUEUED, time.time(), size, mtime))
+            return False
+        state, known_size, known_mtime = row
+        if (known_size, known_mtime) == (size, mtime):
+            return False
+        # a done video is moved out of the queue, so a file of a done row is always a new one, while
+        # an unfinished row without the size and mtime (from an older ledger) just gets them
+        if state != JobLedger.DONE and known_size is None:
+            self._connection.execute('UPDATE jobs SET size = ?, mtime = ? WHERE video = ?', (size, mtime, video))
+            return False
+        self._connection.execute('UPDATE jobs SET state = ?, attempts = 0, error = NULL, updated = ?, size = ?, '
+                                 'mtime = ? WHERE video = ?', (JobLedger.QUEUED, time.time(), size, mtime, video))
+        return True
+
+    def requeue_unfinished(self, retry_failed=False):
+        """Queue again the videos whose processing was interrupted (and failed ones if it's required)."""
+        states = (JobLedger.RUNNING, JobLedger.FAILED) if retry_failed else (JobLedger.RUNNING,)
+        self._connection.execute(f'UPDATE jobs SET state = ?, updated = ? WHERE state IN ({",".join("?" * len(states))})',
+                                 (JobLedger.QUEUED, time.time()) + states)
+
+    def set_running(self, video):
+        self._connection.execute('UPDATE jobs SET state = ?, attempts = attempts + 1, error = NULL, updated = ? '
+                                 'WHERE video = ?', (JobLedger.RUNNING, time.time(), video))
+
+    def set_done(self, video):
+        self._set_state(video, JobLedger.DONE)
+
+    def set_failed(self, video, error):
+        self._set_state(video, JobLedger.FAILED, error)
+
+    def _set_state(self, video, state, error=None):
+        self._connection.execute('UPDATE jobs SET state = ?, error = ?, updated = ? WHERE video = ?',
+                                 (state, error, time.time(), video))
+
+    def get_videos(self, state):
+        return [row[0] for row in
+                self._connection.execute('SELECT video FROM jobs WHERE state = ? ORDER BY video', (state,))]
+
+    def get_states(self):
+        """Return a dict mapping every video to its state, attempts amount and last error."""
+        return {video: (state, attempts, error) for video, state, attempts, error in
+                self._connection.execute('SELECT video, state, attempts, error FROM jobs ORDER BY video')}
+
+    def close(self):
+        self._connection.close()
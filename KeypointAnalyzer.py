@@ -0,0 +1,113 @@
+import csv
+import json
+import cv2
+import numpy as np
+from KeypointStore import KeypointStore
+from PhaseQualifier import PhaseQualifier
+
+
+class KeypointAnalyzer:
+    """Class counting pull ups straight from json key points without decoding or rendering the video.
+
+    Only the container metadata of the video is read (fps and frames amount).
+    """
+
+    REPORT_FORMATS = ('json', 'csv')
+
+    def __init__(self, input_file_name, json_dir, phase_qualifier: PhaseQualifier, required_points):
+        self.input_file_name = input_file_name
+        self.json_dir = json_dir
+        self.phase_qualifier = phase_qualifier
+        self.required_points = required_points
+        self._fps = 0
+        self.frames_amount = 0
+        self.events_labels = []
+        self.phases_timeline = []
+
+    def read_video_metadata(self):
+        cap = cv2.VideoCapture(self.input_file_name)
+        if not cap.isOpened():
+            raise IOError(f"{self.input_file_name} can't be opened.")
+        # the same whole fps as VideoProcessor uses for timestamps
+        self._fps = int(cap.get(cv2.CAP_PROP_FPS))
+        video_frames_amount = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if self._fps <= 0:
+            raise ValueError(f"Fps of {self.input_file_name} is unknown.")
+        return video_frames_amount
+
+    def analyze(self):
+        """Qualify states of all frames having key points and collect rep events and the phases timeline."""
+        video_frames_amount = self.read_video_metadata()
+        keypoint_store = KeypointStore(self.json_dir)
+        # the rendering modes stop at the end of the video, json files of missing frames are ignored the same way
+        self.frames_amount = len(keypoint_store)
+        if video_frames_amount > 0:
+            self.frames_amount = min(self.frames_amount, video_frames_amount)
+        phases, events = self.phase_qualifier.qualify_sequence(
+            keypoint_store.keypoints[:self.frames_amount], self.required_points,
+            keypoint_store.people_present[:self.frames_amount])
+        # frame numbers are counted from 1 and times are frame number / fps as in VideoProcessor
+        self.events_labels = [(frame_num + 1, (frame_num + 1) / self._fps, is_clean_rep)
+                              for frame_num, is_clean_rep in events]
+        self.phases_timeline = self.get_phases_timeline(phases)
+
+    def get_phases_timeline(self, phases):
+        """Return (phase name, first frame, last frame) of every run of frames having the same phase."""
+        if not len(phases):
+            return []
+        phase_names = {number: name for name, number in self.phase_qualifier.phases.items()}
+        changes = np.flatnonzero(np.diff(phases)) + 1
+        starts = [0] + changes.tolist()
+        ends = changes.tolist() + [len(phases)]
+        return [(phase_names[int(phases[start])], start + 1, end) for start, end in zip(starts, ends)]
+
+    def write_report(self, report_file_name, report_format='json'):
+        """Write reps amounts, rep events and the phases timeline.
+
+        :param report_file_name: the report file name
+        :param report_format: json (one document) or csv (one row per phase change or rep event
+        and the last "end" row with clean/unclean reps amounts)
+        """
+        if report_format == 'json':
+            self.write_json_report(report_file_name)
+        elif report_format == 'csv':
+            self.write_csv_report(report_file_name)
+        else:
+            raise ValueError(f"Unknown report format {report_format}.")
+
+    def write_json_report(self, report_file_name):
+        report = {
+            'video': self.input_file_name,
+            'fps': self._fps,
+            'frames': self.frames_amount,
+            'clean_reps': self.phase_qualifier.clean_repeats,
+            'unclean_reps': self.phase_qualifier.unclean_repeats,
+            'events': [{'frame': frame_num, 'time': rep_time, 'clean': is_clean_rep}
+                       for frame_num, rep_time, is_clean_rep in self.events_labels],
+            'phases': [{'phase': phase, 'start_frame': start_frame, 'end_frame': end_frame,
+                        'start_time': start_frame / self._fps, 'end_time': end_frame / self._fps}
+                       for phase, start_frame, end_frame in self.phases_timeline]
+        }
+        with open(report_file_name, 'w') as report_data:
+            json.dump(report, report_data, indent=2)
+
+    def write_csv_report(self, report_file_name):
+        rows = [(start_frame, start_frame / self._fps, 'phase', phase)
+                for phase, start_frame, _ in self.phases_timeline]
+        clean_reps, unclean_reps = 0, 0
+        for frame_num, rep_time, is_clean_rep in self.events_labels:
+            if is_clean_rep:
+                clean_reps += 1
+                rows.append((frame_num, rep_time, 'clean_rep', clean_reps))
+            else:
+                unclean_reps += 1
+                rows.append((frame_num, rep_time, 'unclean_rep', unclean_reps))
+        # a phase change and a rep event of the same frame keep this order
+        rows.sort(key=lambda row: row[0])
+        rows.append((self.frames_amount, self.frames_amount / self._fps, 'end',
+                     f'{self.phase_qualifier.clean_repeats}/{self.phase_qualifier.unclean_repeats}'))
+        with open(report_file_name, 'w', newline='') as report_data:
+            writer = csv.writer(report_data)
+            writer.writerow(['frame', 'time', 'event', 'value'])
+            writer.writerows(rows)
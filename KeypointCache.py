@@ -0,0 +1,163 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from KeypointStore import KeypointStore
+
+
+class KeypointCache:
+    """Class keeping OpenPose key points of analysed videos in a local directory.
+
+    An entry is keyed by a hash of the video content and the OpenPose model and params, so a renamed
+    or copied video is found too, while a changed model or param makes another entry.
+    Every entry is a directory holding the packed key points of all frames and a meta file.
+    Reading an entry updates the modification time of its meta file, and the least recently used entries
+    are evicted when the cache grows over its max size.
+    """
+
+    KEYPOINTS_FILE_NAME = 'keypoints.npy'
+    PEOPLE_AMOUNTS_FILE_NAME = 'people_amounts.npy'
+    META_FILE_NAME = 'meta.json'
+    DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pull_up_analyzer', 'keypoints')
+    DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+    def __init__(self, cache_dir=DEFAULT_DIR, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param cache_dir: the cache directory, it's created if it doesn't exist
+        :param max_size: the max size of all entries in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_video_hash(file_name, chunk_size=1024 ** 2):
+        """Return a hash of the video content."""
+        video_hash = hashlib.blake2b(digest_size=16)
+        with open(file_name, 'rb') as video_data:
+            for chunk in iter(lambda: video_data.read(chunk_size), b''):
+                video_hash.update(chunk)
+        return video_hash.hexdigest()
+
+    @staticmethod
+    def get_model_fingerprint(model_folder):
+        """Return names and sizes of the pose model weights, so updated models don't reuse old key points."""
+        model_files = sorted(glob.glob(os.path.join(model_folder, 'pose', '**', '*.caffemodel'), recursive=True))
+        return [(os.path.relpath(model_file, model_folder), os.path.getsize(model_file)) for model_file in model_files]
+
+    def get_key(self, video_file_name, params):
+        """Return the entry key of a video processed by OpenPose with the given params.
+
+        :param params: a json serializable dict of everything affecting the key points (OpenPose params,
+        the inference frame height, etc.), the model weights are found by its model_folder
+        """
+        key_hash = hashlib.blake2b(digest_size=16)
+        key_hash.update(self.get_video_hash(video_file_name).encode())
+        key_hash.update(json.dumps(params, sort_keys=True).encode())
+        key_hash.update(json.dumps(self.get_model_fingerprint(params.get('model_folder', ''))).encode())
+        return key_hash.hexdigest()
+
+    def get_entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        """Return a key point store of the cached key points, None if there is no such entry."""
+        entry_dir = self.get_entry_dir(key)
+        meta_file_name = os.path.join(entry_dir, KeypointCache.META_FILE_NAME)
+        if not os.path.isfile(meta_file_name):
+            return None
+        # the meta file modification time is the last access time of the entry
+        os.utime(meta_file_name)
+        return KeypointStore.from_arrays(
+            np.load(os.path.join(entry_dir, KeypointCache.KEYPOINTS_FILE_NAME), mmap_mode='r'),
+            np.load(os.path.join(entry_dir, KeypointCache.PEOPLE_AMOUNTS_FILE_NAME), mmap_mode='r'))
+
+    def save(self, key, frames_people_keypoints, meta=None):
+        """Save key points of a video and evict the least recently used entries if the cache is too big.
+
+        :param frames_people_keypoints: a list of (people, 25, 3) arrays of every frame
+        :param meta: a json serializable dict describing the entry (e.g. the video name)
+        :return: whether the entry is saved, an entry bigger than the max cache size isn't
+        """
+        all_people_keypoints, people_amounts = KeypointStore.pack_people_keypoints(frames_people_keypoints)
+        if all_people_keypoints.nbytes + people_amounts.nbytes > self.max_size:
+            return False
+        entry_dir = self.get_entry_dir(key)
+        # the entry is written aside and renamed into place, so an interrupted run doesn't leave a broken entry
+        tmp_entry_dir = f'{entry_dir}.tmp{os.getpid()}'
+        os.makedirs(tmp_entry_dir, exist_ok=True)
+        np.save(os.path.join(tmp_entry_dir, KeypointCache.KEYPOINTS_FILE_NAME), all_people_keypoints)
+        np.save(os.path.join(tmp_entry_dir, KeypointCache.PEOPLE_AMOUNTS_FILE_NAME), people_amounts)
+        meta = dict(meta or {}, frames=len(people_amounts), created=datetime.datetime.now().isoformat(timespec='seconds'))
+        with open(os.path.join(tmp_entry_dir, KeypointCache.META_FILE_NAME), 'w') as meta_data:
+            json.dump(meta, meta_data)
+        self.remove(key)
+        os.rename(tmp_entry_dir, entry_dir)
+        self.prune(self.max_size)
+        return True
+
+    def remove(self, key):
+        entry_dir = self.get_entry_dir(key)
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir)
+
+    def get_entries(self):
+        """Return (key, size in bytes, last access time, meta) of every entry, the least recently used first."""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            # entries being written by other runs aren't complete yet
+            if '.tmp' in key:
+                continue
+            meta_file_name = os.path.join(self.get_entry_dir(key), KeypointCache.META_FILE_NAME)
+            if not os.path.isfile(meta_file_name):
+                continue
+            with open(meta_file_name) as meta_data:
+                meta = json.load(meta_data)
+            entry_dir = self.get_entry_dir(key)
+            size = sum(os.path.getsize(os.path.join(entry_dir, f_name)) for f_name in os.listdir(entry_dir))
+            entries.append((key, size, os.path.getmtime(meta_file_name), meta))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def remove_stale_tmp_dirs(self):
+        """Remove entries left unfinished by interrupted runs (their writing processes don't exist anymore)."""
+        for f_name in os.listdir(self.cache_dir):
+            if '.tmp' not in f_name:
+                continue
+            pid = f_name.rsplit('.tmp', 1)[1]
+            if pid.isdigit() and not self.is_process_running(int(pid)):
+                shutil.rmtree(os.path.join(self.cache_dir, f_name), ignore_errors=True)
+
+    @staticmethod
+    def is_process_running(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # the process exists but belongs to another user
+            return True
+        return True
+
+    def get_size(self):
+        return sum(size for _, size, _, _ in self.get_entries())
+
+    def prune(self, max_size):
+        """Remove the least recently used entries until all entries take at most max_size bytes.
+
+        Entries left unfinished by interrupted runs are removed too.
+        :return: keys of the removed entries
+        """
+        self.remove_stale_tmp_dirs()
+        entries = self.get_entries()
+        size = sum(entry_size for _, entry_size, _, _ in entries)
+        removed_keys = []
+        for key, entry_size, _, _ in entries:
+            if size <= max_size:
+                break
+            self.remove(key)
+            size -= entry_size
+            removed_keys.append(key)
+        return removed_keys
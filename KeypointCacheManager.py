@@ -0,0 +1,68 @@
+import argparse
+import datetime
+from KeypointCache import KeypointCache
+
+
+class KeypointCacheManager:
+    """Class listing and pruning the key points cache of PullUpCounter."""
+
+    COMMANDS = ('list', 'prune', 'remove', 'clear')
+
+    def __init__(self):
+        self.cache_dir = KeypointCache.DEFAULT_DIR
+        self.command = 'list'
+        self.max_size = KeypointCache.DEFAULT_MAX_SIZE
+        self.keys = []
+        self.parse_cmd_line()
+
+    def parse_cmd_line(self):
+        """Extract arguments from the command line."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument('command', choices=KeypointCacheManager.COMMANDS,
+                            help='list entries, prune the least recently used ones down to --max-size, '
+                                 'remove the given entries or clear the cache')
+        parser.add_argument('keys', nargs='*', help='keys of the entries to remove')
+        parser.add_argument('--cache-dir', dest='cache_dir', default=KeypointCache.DEFAULT_DIR,
+                            help='key points cache directory')
+        parser.add_argument('--max-size', dest='max_size', type=float,
+                            default=KeypointCache.DEFAULT_MAX_SIZE / 1024 ** 2, help='max cache size in MB for prune')
+        args = parser.parse_args()
+
+        self.command = args.command
+        self.cache_dir = args.cache_dir
+        if args.max_size < 0:
+            raise ValueError("Max cache size must be a non-negative number.")
+        self.max_size = int(args.max_size * 1024 ** 2)
+        if self.command == 'remove' and not args.keys:
+            raise ValueError("Keys of the entries to remove aren't specified.")
+        self.keys = args.keys
+
+    def start(self):
+        keypoint_cache = KeypointCache(self.cache_dir, self.max_size)
+        if self.command == 'list':
+            self.print_entries(keypoint_cache)
+        elif self.command == 'prune':
+            removed_keys = keypoint_cache.prune(self.max_size)
+            print(f'{len(removed_keys)} entries are removed, {keypoint_cache.get_size() / 1024 ** 2:.1f} MB are left.')
+        elif self.command == 'remove':
+            for key in self.keys:
+                keypoint_cache.remove(key)
+        elif self.command == 'clear':
+            removed_keys = keypoint_cache.prune(0)
+            print(f'{len(removed_keys)} entries are removed.')
+
+    @staticmethod
+    def print_entries(keypoint_cache):
+        entries = keypoint_cache.get_entries()
+        print(f'{"key":<34}{"size, MB":>10}{"frames":>9}  {"last used":<21}video')
+        for key, size, access_time, meta in reversed(entries):
+            last_used = datetime.datetime.fromtimestamp(access_time).isoformat(sep=' ', timespec='seconds')
+            print(f'{key:<34}{size / 1024 ** 2:>10.1f}{meta.get("frames", 0):>9}  {last_used:<21}'
+                  f'{meta.get("video", "")}')
+        print(f'{len(entries)} entries, {sum(size for _, size, _, _ in entries) / 1024 ** 2:.1f} MB '
+              f'in {keypoint_cache.cache_dir}')
+
+
+if __name__ == '__main__':
+    keypoint_cache_manager = KeypointCacheManager()
+    keypoint_cache_manager.start()
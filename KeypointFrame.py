@@ -0,0 +1,84 @@
+from collections.abc import Mapping
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def _get_layout(required_points_items):
+    """Return joint rows and the OpenPose indexes of required points.
+
+    :param required_points_items: a tuple of (joint name, OpenPose joint number) pairs
+    :return: a dict mapping a joint name to its row and an array of OpenPose joint numbers
+    """
+    rows = {joint: row for row, (joint, _) in enumerate(required_points_items)}
+    indexes = np.array([joint_number for _, joint_number in required_points_items], dtype=np.intp)
+    return rows, indexes
+
+
+class KeypointFrame(Mapping):
+    """Class keeping required key points of one frame in a (joints, 2) int array with a validity mask.
+
+    It can be read as the {joint: (x, y) or None} dict which was used before,
+    so PhaseQualifier and Drawer call sites keep indexing it by joint names.
+    """
+
+    def __init__(self, rows, coords, valid):
+        self._rows = rows
+        self.coords = coords
+        self.valid = valid
+
+    @classmethod
+    def from_keypoints(cls, keypoints, needed_points: dict):
+        """Extract required points from OpenPose key points.
+
+        :param keypoints: an array-like of (x, y, probability) rows or a flat list of them (json format)
+        :param needed_points: a dict mapping joint names to OpenPose joint numbers
+        :return: a key point frame
+        """
+        rows, indexes = _get_layout(tuple(needed_points.items()))
+        keypoints = np.asarray(keypoints).reshape(-1, 3)
+        # a point is stored as ints (truncated) and (0, 0) means that the point isn't found
+        coords = keypoints[indexes, :2].astype(int)
+        valid = coords.any(axis=1)
+        return cls(rows, coords, valid)
+
+    @classmethod
+    def interpolate(cls, start, end, t):
+        """Linearly interpolate key points between two frames.
+
+        :param start: key points of the earlier frame
+        :param end: key points of the later frame
+        :param t: the position between the frames from 0 (start) to 1 (end)
+        :return: a key point frame, a joint is found only if it's found in both frames
+        """
+        valid = start.valid & end.valid
+        coords = np.rint(start.coords + (end.coords - start.coords) * t).astype(int)
+        coords[~valid] = 0
+        return cls(start._rows, coords, valid)
+
+    @staticmethod
+    def extract_sequence(keypoints, needed_points: dict):
+        """Extract required points of all frames of a key points sequence at once.
+
+        :param keypoints: an array of OpenPose key points of shape (frames, 25, 3)
+        :param needed_points: a dict mapping joint names to OpenPose joint numbers
+        :return: a dict mapping joint names to columns, (frames, joints, 2) int coordinates and
+        a (frames, joints) validity mask
+        """
+        rows, indexes = _get_layout(tuple(needed_points.items()))
+        coords = np.asarray(keypoints)[:, indexes, :2].astype(int)
+        valid = coords.any(axis=2)
+        return rows, coords, valid
+
+    def __getitem__(self, joint):
+        row = self._rows[joint]
+        if not self.valid[row]:
+            return None
+        x, y = self.coords[row].tolist()
+        return x, y
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,144 @@
+import json
+import os
+from os import walk
+import numpy as np
+
+
+class KeypointStore:
+    """Class keeping OpenPose key points of a whole video in one memory-mapped array.
+
+    The first time a json directory is read, the key points of all frames are packed into a
+    (frames, 25, 3) array of the first person saved next to the directory together with a people-present mask
+    and a (frames, max people amount, 25, 3) array of all people with the people amount of every frame.
+    Later runs memory-map these files instead of opening one json file per frame.
+    The cache is rebuilt when the modification time or the files amount of the directory changes.
+    If the cache can't be written (e.g. a read-only share of json directories), the key points are kept in memory.
+    """
+
+    POINTS_AMOUNT = 25
+
+    def __init__(self, json_dir):
+        """
+        :param json_dir: a directory containing json files producing by OpenPose (None creates an empty store)
+        """
+        self.keypoints = None
+        self.people_present = None
+        self.all_people_keypoints = None
+        self.people_amounts = None
+        if json_dir is None:
+            return
+        self.json_dir = os.path.normpath(json_dir)
+        self._keypoints_file_name = f'{self.json_dir}_keypoints.npy'
+        self._people_present_file_name = f'{self.json_dir}_people.npy'
+        self._all_people_keypoints_file_name = f'{self.json_dir}_all_people_keypoints.npy'
+        self._people_amounts_file_name = f'{self.json_dir}_people_amounts.npy'
+        self._meta_file_name = f'{self.json_dir}_keypoints.json'
+        self._load()
+
+    @classmethod
+    def from_arrays(cls, all_people_keypoints, people_amounts):
+        """Create a store of key points which aren't read from json files (e.g. cached OpenPose results).
+
+        :param all_people_keypoints: a (frames, max people amount, 25, 3) array
+        :param people_amounts: the amount of people found on every frame
+        """
+        keypoint_store = cls(None)
+        keypoint_store.all_people_keypoints = all_people_keypoints
+        keypoint_store.people_amounts = people_amounts
+        keypoint_store.keypoints = all_people_keypoints[:, 0]
+        keypoint_store.people_present = np.asarray(people_amounts) > 0
+        return keypoint_store
+
+    @staticmethod
+    def pack_people_keypoints(frames_people):
+        """Pack key points of people found on every frame into one array.
+
+        :param frames_people: a list of (people, 25, 3) arrays (or lists of (25, 3) arrays)
+        :return: a (frames, max people amount, 25, 3) float32 array and the amount of people of every frame
+        """
+        people_amounts = np.array([len(people) for people in frames_people], np.int32)
+        all_people_keypoints = np.zeros((len(frames_people), max(people_amounts, default=1) or 1,
+                                         KeypointStore.POINTS_AMOUNT, 3), np.float32)
+        for frame_num, people in enumerate(frames_people):
+            for person_num, person_keypoints in enumerate(people):
+                all_people_keypoints[frame_num, person_num] = person_keypoints
+        return all_people_keypoints, people_amounts
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    @staticmethod
+    def get_json_files_from_dir(json_dir):
+        """Return all file names from the specified directory.
+
+        :param json_dir: a directory containing json files producing by OpenPose
+        :return: a list of file names
+        """
+        json_files = []
+        for _, _, f_names in walk(json_dir):
+            json_files.extend(f_names)
+            break
+        json_files = sorted(json_files)
+        return json_files
+
+    def _get_dir_state(self, json_files):
+        return {'mtime': os.stat(self.json_dir).st_mtime_ns, 'files_amount': len(json_files)}
+
+    def _is_cache_valid(self, dir_state):
+        cache_file_names = (self._keypoints_file_name, self._people_present_file_name,
+                            self._all_people_keypoints_file_name, self._people_amounts_file_name, self._meta_file_name)
+        if not all(os.path.isfile(file_name) for file_name in cache_file_names):
+            return False
+        with open(self._meta_file_name, "r") as meta_data:
+            return json.load(meta_data) == dir_state
+
+    def _load(self):
+        json_files = self.get_json_files_from_dir(self.json_dir)
+        dir_state = self._get_dir_state(json_files)
+        if not self._is_cache_valid(dir_state):
+            arrays = self._read_json_files(json_files)
+            try:
+                self._save_cache(arrays, dir_state)
+            except OSError as e:
+                print(f"Key points of {self.json_dir} can't be cached next to it ({e}), they're kept in memory.")
+                self.keypoints, self.people_present, self.all_people_keypoints, self.people_amounts = arrays
+                return
+        self.keypoints = np.load(self._keypoints_file_name, mmap_mode='r')
+        self.people_present = np.load(self._people_present_file_name, mmap_mode='r')
+        self.all_people_keypoints = np.load(self._all_people_keypoints_file_name, mmap_mode='r')
+        self.people_amounts = np.load(self._people_amounts_file_name, mmap_mode='r')
+
+    def _read_json_files(self, json_files):
+        """Pack the key points of every json file.
+
+        :return: key points of the first person, the people-present mask, key points of all people
+        and the people amounts of every frame
+        """
+        frames_people = []
+        for filename in json_files:
+            with open(os.path.join(self.json_dir, filename), "r") as json_data:
+                data = json.load(json_data)
+            frames_people.append([np.reshape(person['pose_keypoints_2d'], (-1, 3)) for person in data['people']])
+        all_people_keypoints, people_amounts = self.pack_people_keypoints(frames_people)
+        # the first person of a frame is the athlete in the single athlete mode
+        keypoints = np.ascontiguousarray(all_people_keypoints[:, 0])
+        people_present = people_amounts > 0
+        return keypoints, people_present, all_people_keypoints, people_amounts
+
+    def _save_cache(self, arrays, dir_state):
+        """Save the packed key points into the cache files."""
+        keypoints, people_present, all_people_keypoints, people_amounts = arrays
+        # the meta file is written last, so an interrupted build is never taken for a valid cache
+        self._save_array(self._keypoints_file_name, keypoints)
+        self._save_array(self._people_present_file_name, people_present)
+        self._save_array(self._all_people_keypoints_file_name, all_people_keypoints)
+        self._save_array(self._people_amounts_file_name, people_amounts)
+        with open(self._meta_file_name, "w") as meta_data:
+            json.dump(dir_state, meta_data)
+
+    @staticmethod
+    def _save_array(file_name, array):
+        tmp_file_name = f'{file_name}.tmp'
+        with open(tmp_file_name, "wb") as array_file:
+            np.save(array_file, array)
+        os.replace(tmp_file_name, file_name)
@@ -0,0 +1,192 @@
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from AsyncVideoWriter import AsyncVideoWriter
+from FfmpegVideoWriter import FfmpegVideoWriter
+from LiveFrameSource import LiveFrameSource
+from PhaseQualifier import PhaseQualifier
+from Profiler import Profiler
+from PullUpCounter import PullUpCounter
+from ResultsDrawer import ResultsDrawer
+from VideoProcessor import VideoProcessor
+
+
+class LiveCounter:
+    """Class counting pull ups on a camera or a network stream while the session goes on.
+
+    Only the newest captured frame is processed, frames captured meanwhile are dropped,
+    so the end-to-end latency is bounded by the processing time of one frame.
+    """
+
+    def __init__(self):
+        self.source = ""
+        self.replay = False
+        self.max_latency = 0.2
+        self.duration = 0
+        self.record_dir = None
+        self.segment_duration = 60
+        self.preview = True
+        self.inference_height = None
+
+        self.phase_qualifier = PhaseQualifier(30, 30, 5, 0.5)
+        self.profiler = Profiler(enabled=True)
+        self.events_labels = []
+        self.processed_frames_amount = 0
+        self.stale_frames_amount = 0
+        self.late_frames_amount = 0
+        self._drawer = None
+        # the session time in frames the drawer's timer has reached
+        self._drawn_frames_amount = 0
+        self._segment_writer = None
+        self._segment_start_time = 0
+        self._segments_amount = 0
+        # finished segments are flushed in the background, so the rotation doesn't stall the live loop
+        self._segment_closer = ThreadPoolExecutor(1)
+        self._closed_segments = []
+        self.parse_cmd_line()
+
+    def parse_cmd_line(self):
+        """Extract arguments from the command line."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument('source', help='camera index, RTSP/HTTP stream url or a video file (with --replay)')
+        parser.add_argument('--replay', action='store_true',
+                            help='replay a video file at its real-time pace as if it was a camera')
+        parser.add_argument('--max-latency', dest='max_latency', type=float, default=200,
+                            help='target end-to-end latency in ms, older frames are dropped without processing')
+        parser.add_argument('--duration', type=float, default=0,
+                            help='stop after this amount of seconds (0 runs until the stream ends)')
+        parser.add_argument('--record-dir', dest='record_dir', default=None,
+                            help='directory in which processed frames are recorded as video segments')
+        parser.add_argument('--segment-duration', dest='segment_duration', type=float, default=60,
+                            help='length of recorded segments in seconds')
+        parser.add_argument('--headless', action='store_true', help="don't show processed frames")
+        parser.add_argument('--inference-height', dest='inference_height', type=int, default=None,
+                            help='downscale frames passed to OpenPose to this height (e.g. 368)')
+        args = parser.parse_args()
+
+        self.source = args.source
+        self.replay = args.replay
+        if self.replay and not os.path.isfile(self.source):
+            raise FileNotFoundError("Replayed video file not found.")
+        if args.max_latency <= 0:
+            raise ValueError("Max latency must be a positive number.")
+        self.max_latency = args.max_latency / 1000
+        self.duration = args.duration
+        self.record_dir = args.record_dir
+        if self.record_dir and not os.path.isdir(self.record_dir):
+            raise FileNotFoundError("Record directory not found.")
+        if args.segment_duration <= 0:
+            raise ValueError("Segment duration must be a positive number.")
+        self.segment_duration = args.segment_duration
+        self.preview = not args.headless
+        self.inference_height = args.inference_height
+
+    def start(self):
+        op_wrapper = PullUpCounter.start_open_pose()
+        frame_source = LiveFrameSource(self.source, self.replay)
+        self._drawer = ResultsDrawer(int(frame_source.fps), self.phase_qualifier.phases)
+        start_time = time.perf_counter()
+        try:
+            while not self.duration or time.perf_counter() - start_time < self.duration:
+                has_frame, frame, capture_time = frame_source.read()
+                if not has_frame:
+                    break
+                if time.perf_counter() - capture_time > self.max_latency:
+                    self.stale_frames_amount += 1
+                    continue
+                frame = self.process_frame(op_wrapper, frame, capture_time - start_time)
+                self.output_frame(frame, frame_source.fps)
+                latency = time.perf_counter() - capture_time
+                self.profiler.add('latency', capture_time, latency)
+                if latency > self.max_latency:
+                    self.late_frames_amount += 1
+                self.processed_frames_amount += 1
+                if self.preview and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            frame_source.release()
+            self.close_segments()
+            if self.preview:
+                cv2.destroyAllWindows()
+        self.print_report(frame_source)
+
+    def process_frame(self, op_wrapper, frame, frame_time):
+        """Qualify the athlete's state on the frame and put the pull ups info on it."""
+        with self.profiler.stage('inference'):
+            points = VideoProcessor.infer_points_batch(op_wrapper, [frame], PullUpCounter.REQUIRED_POINTS,
+                                                       self.inference_height)[0]
+        if points is None:
+            return frame
+        clean_repeats, unclean_repeats = self.phase_qualifier.clean_repeats, self.phase_qualifier.unclean_repeats
+        with self.profiler.stage('qualify_state'):
+            self.phase_qualifier.qualify_state(points)
+        if clean_repeats != self.phase_qualifier.clean_repeats:
+            self.add_event(frame_time, True)
+        elif unclean_repeats != self.phase_qualifier.unclean_repeats:
+            self.add_event(frame_time, False)
+        with self.profiler.stage('render'):
+            # the timer is driven by capture times, as dropped frames never reach the drawer
+            frames_amount = round(frame_time * self._drawer.timer.fps)
+            frame = self._drawer.display_info(frame, self.phase_qualifier,
+                                              elapsed_frames=frames_amount - self._drawn_frames_amount)
+            self._drawn_frames_amount = frames_amount
+            self._drawer.display_skeleton(frame, points, PullUpCounter.REQUIRED_PAIRS)
+            self._drawer.draw_line_between_wrists(frame, points)
+            self._drawer.draw_chin_point(frame, self.phase_qualifier)
+        return frame
+
+    def add_event(self, event_time, is_clean_rep):
+        self.events_labels.append((event_time, is_clean_rep))
+        print(f'{event_time:.1f} sec: {"clean" if is_clean_rep else "unclean"} rep. '
+              f'Clean reps: {self.phase_qualifier.clean_repeats}, unclean reps: {self.phase_qualifier.unclean_repeats}')
+
+    def output_frame(self, frame, fps):
+        if self.preview:
+            with self.profiler.stage('imshow'):
+                cv2.imshow('Live', frame)
+        if self.record_dir:
+            with self.profiler.stage('record'):
+                self.record_frame(frame, fps)
+
+    def record_frame(self, frame, fps):
+        """Write the frame to the current segment, a new segment is started every segment_duration seconds.
+
+        Dropped frames aren't recorded, so segments play faster than the session when frames are dropped.
+        """
+        if self._segment_writer and time.perf_counter() - self._segment_start_time >= self.segment_duration:
+            self._closed_segments.append(self._segment_closer.submit(self._segment_writer.release))
+            self._segment_writer = None
+        if not self._segment_writer:
+            self._segments_amount += 1
+            file_name = os.path.join(self.record_dir, f'live_{datetime.datetime.now():%Y%m%d_%H%M%S}_'
+                                                      f'{self._segments_amount:04d}.mp4')
+            height, width = frame.shape[:2]
+            self._segment_writer = AsyncVideoWriter(FfmpegVideoWriter(file_name, fps, (width, height)))
+            self._segment_start_time = time.perf_counter()
+        self._segment_writer.write(frame)
+
+    def close_segments(self):
+        """Wait until all segments are written, an error of any of them is raised."""
+        if self._segment_writer:
+            self._segment_writer.release()
+            self._segment_writer = None
+        self._segment_closer.shutdown()
+        for closed_segment in self._closed_segments:
+            closed_segment.result()
+
+    def print_report(self, frame_source):
+        print(f'Clean reps: {self.phase_qualifier.clean_repeats}, unclean reps: {self.phase_qualifier.unclean_repeats}')
+        print(f'{frame_source.captured_frames_amount} frames are captured, {self.processed_frames_amount} processed, '
+              f'{frame_source.dropped_frames_amount} dropped while processing, {self.stale_frames_amount} dropped '
+              f'as stale, {self.late_frames_amount} exceeded {self.max_latency * 1000:.0f} ms latency.')
+        print(self.profiler.report())
+
+
+if __name__ == '__main__':
+    live_counter = LiveCounter()
+    live_counter.start()
@@ -0,0 +1,79 @@
+import threading
+import time
+import cv2
+
+
+class LiveFrameSource:
+    """Class capturing a camera or a network stream on a background thread and keeping only the newest frame.
+
+    Frames which weren't read before a newer one arrived are dropped, so a slow reader always gets
+    the latest frame instead of a growing backlog. A video file can be replayed at its real-time pace
+    to stand in for a camera.
+    """
+
+    DEFAULT_FPS = 30
+
+    def __init__(self, source, replay=False):
+        """
+        :param source: a camera index, an RTSP/HTTP stream url or a video file name (with replay)
+        :param replay: deliver frames of a video file at the pace of its fps
+        """
+        self.source = source
+        self.cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        if not self.cap.isOpened():
+            raise IOError(f"{source} can't be opened.")
+        # cameras and streams don't always report their fps
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or LiveFrameSource.DEFAULT_FPS
+        self.replay = replay
+        self.captured_frames_amount = 0
+        self.dropped_frames_amount = 0
+        self._frame = None
+        self._capture_time = None
+        self._ended = False
+        self._stop = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._capture, name='live-frame-source', daemon=True)
+        self._thread.start()
+
+    def _capture(self):
+        start_time = time.perf_counter()
+        try:
+            while not self._stop:
+                has_frame, frame = self.cap.read()
+                if not has_frame:
+                    break
+                if self.replay:
+                    delay = start_time + self.captured_frames_amount / self.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                with self._condition:
+                    if self._frame is not None:
+                        self.dropped_frames_amount += 1
+                    self._frame = frame
+                    self._capture_time = time.perf_counter()
+                    self.captured_frames_amount += 1
+                    self._condition.notify_all()
+        finally:
+            with self._condition:
+                self._ended = True
+                self._condition.notify_all()
+
+    def read(self):
+        """Wait for a frame newer than the previously read one.
+
+        :return: whether a frame is read (False at the end of the stream), the frame and
+        its capture time (time.perf_counter)
+        """
+        with self._condition:
+            while self._frame is None and not self._ended:
+                self._condition.wait()
+            if self._frame is None:
+                return False, None, None
+            frame, capture_time = self._frame, self._capture_time
+            self._frame = None
+        return True, frame, capture_time
+
+    def release(self):
+        self._stop = True
+        self._thread.join()
+        self.cap.release()
@@ -1,11 +1,16 @@
 import Utils
 import math
+import numpy as np
 from collections import deque
+from KeypointFrame import KeypointFrame
 
 
 class PhaseQualifier:
     """Class processing key points to identify athlete state."""
 
+    # the amount of frames whose wrists and shoulders movement is considered by get_last_y_velocity
+    Y_VELOCITY_HISTORY = 5
+
     def __init__(self, arm_angle_threshold, leg_angle_threshold, failed_attempts_amount_threshold,
                  neck_chin_top_of_head_ratio, chin_to_wrists_raise_ratio_to_start_attempt=0.7,
                  chin_to_wrists_raise_ration_to_finish_attempt=0.1, wrists_level_angle_threshold=5,
@@ -40,6 +45,10 @@ class PhaseQualifier:
         self._prev_shoulders_y = None
         self._prev_wrists_y = None
         self._angle_between_legs = None
+        # the movement tracked in every phase, unlike the deviations above which are tracked only while pulling
+        self._last_y_velocities = deque(maxlen=PhaseQualifier.Y_VELOCITY_HISTORY)
+        self._prev_moving_wrists_y = None
+        self._prev_moving_shoulders_y = None
 
     def _set_cur_phase_as(self, phase: str):
         assert phase in self._phases
@@ -153,8 +162,9 @@ class PhaseQualifier:
         possible distance between these points) and multiply it by our chin-to-wrists-raise-ratio-to-start-attempt
         and chin-to-wrists-raise-ration-to-finish-attempt COEFFs.
         """
-        distance_between_wrists_and_chin = self.find_distance_between_wrists_and_chin(points)
+        self._set_attempt_positions(self.find_distance_between_wrists_and_chin(points))
 
+    def _set_attempt_positions(self, distance_between_wrists_and_chin):
         if not distance_between_wrists_and_chin:
             # if the distance isn't found we set our threshold distances in infinity to
             # prevent unclean pull ups attempt counting while comparing them with current wrists-chin distances
@@ -254,8 +264,9 @@ class PhaseQualifier:
         """
         if not self.chin_point:
             return
-        cur_distance_between_chin_and_wrists = self.find_distance_between_wrists_and_chin(points)
+        self._check_unclean_pull_up_attempt(self.find_distance_between_wrists_and_chin(points))
 
+    def _check_unclean_pull_up_attempt(self, cur_distance_between_chin_and_wrists):
         if not self._pull_up_attempt_flag:
             self._pull_up_attempt_flag = cur_distance_between_chin_and_wrists <= self._distance_between_chin_and_wrist_to_start_attempt
         else:
@@ -268,7 +279,9 @@ class PhaseQualifier:
 
     def _update_wrists_y_deviations(self, points):
         """Add a current wrists y deviation to a wrists y deviations queue."""
-        cur_wrists_y = (points['LWrist'][1] + points['RWrist'][1]) / 2
+        self._add_wrists_y((points['LWrist'][1] + points['RWrist'][1]) / 2)
+
+    def _add_wrists_y(self, cur_wrists_y):
         if self._prev_wrists_y:
             cur_wrists_y_deviation = abs(self._prev_wrists_y - cur_wrists_y)
             self._last_wrist_y_deviations.append(cur_wrists_y_deviation)
@@ -276,12 +289,32 @@ class PhaseQualifier:
 
     def _update_shoulders_y_deviations(self, points):
         """Add a current shoulders y deviation to a shoulders y deviations queue."""
-        cur_shoulders_y = (points['LShoulder'][1] + points['RShoulder'][1]) / 2
+        self._add_shoulders_y((points['LShoulder'][1] + points['RShoulder'][1]) / 2)
+
+    def _add_shoulders_y(self, cur_shoulders_y):
         if self._prev_shoulders_y:
             cur_shoulders_y_deviation = abs(self._prev_shoulders_y - cur_shoulders_y)
             self._last_shoulder_y_deviations.append(cur_shoulders_y_deviation)
         self._prev_shoulders_y = cur_shoulders_y
 
+    def get_last_y_velocity(self):
+        """Return the fastest vertical movement of wrists or shoulders in pixels per frame over the last frames.
+
+        The movement is tracked by qualify_state in every phase. The fastest one of several frames is taken,
+        so a single still (or noisy) frame in the middle of a movement doesn't look like a rest.
+        """
+        return max(self._last_y_velocities, default=0)
+
+    def _update_y_velocity(self, points):
+        wrists_y = (points['LWrist'][1] + points['RWrist'][1]) / 2 if points['LWrist'] and points['RWrist'] else None
+        shoulders_y = (points['LShoulder'][1] + points['RShoulder'][1]) / 2 \
+            if points['LShoulder'] and points['RShoulder'] else None
+        deviations = [abs(cur_y - prev_y) for cur_y, prev_y in ((wrists_y, self._prev_moving_wrists_y),
+                                                                 (shoulders_y, self._prev_moving_shoulders_y))
+                      if cur_y is not None and prev_y is not None]
+        self._last_y_velocities.append(max(deviations, default=0))
+        self._prev_moving_wrists_y, self._prev_moving_shoulders_y = wrists_y, shoulders_y
+
     def _process_lowering(self, points):
         """Handle the lowering pull up phase.
 
@@ -389,6 +422,7 @@ class PhaseQualifier:
         return self.chin_point[1] <= avg_wrists_y
 
     def qualify_state(self, points):
+        self._update_y_velocity(points)
         self.define_chin_point(points)
         if self.is_there_hang(points):
             self._zero_failed_phase_define_attempts()
@@ -423,3 +457,148 @@ class PhaseQualifier:
         chin_point_x = neck_point[0] + int((nose_point[0] - neck_point[0]) * self.neck_chin_nose_ratio)
         chin_point_y = neck_point[1] + int((nose_point[1] - neck_point[1]) * self.neck_chin_nose_ratio)
         self._chin_point = [chin_point_x, chin_point_y]
+
+    def qualify_sequence(self, keypoints, required_points, people_present=None):
+        """Qualify states of a whole key points sequence at once.
+
+        All the per-frame geometry (angles, chin points, wrists and shoulders levels) is computed
+        for every frame with NumPy first and only the phase transitions are run frame by frame.
+        Phases, counters and the qualifier state are the same as after calling qualify_state
+        for every frame containing a person, except the movement kept for get_last_y_velocity.
+
+        :param keypoints: an array of OpenPose key points of shape (frames, 25, 3)
+        :param required_points: a dict mapping joint names to OpenPose joint numbers
+        :param people_present: a mask of frames containing a person, by default every frame contains one
+        :return: an array of phase numbers (see phases) per frame and a list of (frame index, is clean rep) events
+        """
+        rows, coords, valid = KeypointFrame.extract_sequence(keypoints, required_points)
+        if people_present is None:
+            people_present = np.ones(len(coords), bool)
+        features = self._get_sequence_features(coords, valid, rows)
+        phases = np.empty(len(coords), np.int8)
+        events = []
+        frames_features = zip(*(feature.tolist() for feature in features))
+        for frame_num, (person_is_found, frame_features) in enumerate(zip(people_present, frames_features)):
+            if person_is_found:
+                clean_repeats, unclean_repeats = self._clean_repeats, self._unclean_repeats
+                self._qualify_frame_features(*frame_features)
+                if clean_repeats != self._clean_repeats:
+                    events.append((frame_num, True))
+                elif unclean_repeats != self._unclean_repeats:
+                    events.append((frame_num, False))
+            phases[frame_num] = self._phases[self._cur_phase]
+
+        people_frames = np.flatnonzero(people_present)
+        if len(people_frames):
+            last_frame = people_frames[-1]
+            has_chin, chin_x, chin_y = features[3][last_frame], features[4][last_frame], features[5][last_frame]
+            self._chin_point = [int(chin_x), int(chin_y)] if has_chin else None
+        return phases, events
+
+    def _get_sequence_features(self, coords, valid, rows):
+        """Compute the geometry used by the phase transitions for all frames.
+
+        :return: a tuple of per-frame arrays: hang, arms are straight, initial position, chin is found,
+        chin x, chin y, chin is over wrists level, wrists-chin distance, wrists y, shoulders y
+        """
+        def joint(name):
+            return coords[:, rows[name]], valid[:, rows[name]]
+
+        (l_wrist, l_wrist_ok), (r_wrist, r_wrist_ok) = joint('LWrist'), joint('RWrist')
+        (l_elbow, l_elbow_ok), (r_elbow, r_elbow_ok) = joint('LElbow'), joint('RElbow')
+        (l_shoulder, l_shoulder_ok), (r_shoulder, r_shoulder_ok) = joint('LShoulder'), joint('RShoulder')
+        (l_hip, l_hip_ok), (r_hip, r_hip_ok) = joint('LHip'), joint('RHip')
+        (l_knee, l_knee_ok), (r_knee, r_knee_ok) = joint('LKnee'), joint('RKnee')
+        (l_ear, l_ear_ok), (r_ear, r_ear_ok) = joint('LEar'), joint('REar')
+        (nose, nose_ok), (neck, neck_ok) = joint('Nose'), joint('Neck')
+        wrists_ok = l_wrist_ok & r_wrist_ok
+        wrists_y = (l_wrist[:, 1] + r_wrist[:, 1]) / 2
+
+        # define_chin_point
+        has_chin = ((l_ear_ok & r_ear_ok) | nose_ok) & neck_ok
+        head = np.where(nose_ok[:, None], nose, (l_ear + r_ear) / 2)
+        chin = neck + np.trunc((head - neck) * self.neck_chin_nose_ratio).astype(int)
+
+        # are_arms_straight
+        arms_angles = []
+        for wrist, elbow, shoulder, arm_ok in ((l_wrist, l_elbow, l_shoulder, l_wrist_ok & l_elbow_ok & l_shoulder_ok),
+                                               (r_wrist, r_elbow, r_shoulder, r_wrist_ok & r_elbow_ok & r_shoulder_ok)):
+            arm_angles = np.full(len(coords), math.inf)
+            arm_angles[arm_ok] = Utils.get_angles_between_three_points(wrist[arm_ok], elbow[arm_ok], shoulder[arm_ok])
+            arms_angles.append(arm_angles)
+        arms_are_straight = (arms_angles[0] < self.arm_angle_threshold) & (arms_angles[1] < self.arm_angle_threshold)
+
+        # are_legs_together
+        legs_ok = l_hip_ok & l_knee_ok & r_hip_ok & r_knee_ok
+        angles_between_legs = np.full(len(coords), -math.inf)
+        angles_between_legs[legs_ok] = Utils.get_angles_between_vectors(l_hip[legs_ok] - l_knee[legs_ok],
+                                                                        r_hip[legs_ok] - r_knee[legs_ok])
+        legs_are_together = angles_between_legs <= self.leg_angle_threshold
+
+        # are_wrists_on_same_level
+        deltas_x = np.abs(l_wrist[:, 0] - r_wrist[:, 0])
+        deltas_y = np.abs(l_wrist[:, 1] - r_wrist[:, 1])
+        level_ok = wrists_ok & (deltas_x != 0)
+        wrists_level_angles = np.full(len(coords), math.inf)
+        wrists_level_angles[level_ok] = Utils.get_slope_angles(deltas_x[level_ok], deltas_y[level_ok])
+        wrists_are_on_same_level = level_ok & (wrists_level_angles <= self.wrists_level_angle_threshold)
+
+        # are_wrists_higher_than_elbows
+        wrists_are_higher_than_elbows = wrists_ok & l_elbow_ok & r_elbow_ok & (l_wrist[:, 1] < l_elbow[:, 1]) & (
+                r_wrist[:, 1] < r_elbow[:, 1])
+
+        # is_head_between_wrists
+        min_wrists_x = np.minimum(l_wrist[:, 0], r_wrist[:, 0])
+        max_wrists_x = np.maximum(l_wrist[:, 0], r_wrist[:, 0])
+        head_is_between_wrists = wrists_ok & has_chin & (min_wrists_x < chin[:, 0]) & (chin[:, 0] < max_wrists_x)
+
+        hang = wrists_are_on_same_level & wrists_are_higher_than_elbows & head_is_between_wrists & legs_are_together
+
+        # are_wrists_over_body
+        other_points = np.ones(len(rows), bool)
+        other_points[[rows['LWrist'], rows['RWrist']]] = False
+        other_ys = np.where(valid[:, other_points], coords[:, other_points, 1], np.iinfo(coords.dtype).max)
+        lowest_y = other_ys.min(axis=1)
+        wrists_are_over_body = wrists_ok & (l_wrist[:, 1] < lowest_y) & (r_wrist[:, 1] < lowest_y)
+        there_is_initial_position = arms_are_straight & wrists_are_over_body
+
+        # is_chin_over_wrists_level and find_distance_between_wrists_and_chin
+        chin_is_over_wrists_level = wrists_ok & has_chin & (chin[:, 1] <= wrists_y)
+        distances_between_wrists_and_chin = chin[:, 1] - wrists_y
+
+        shoulders_y = np.where(l_shoulder_ok & r_shoulder_ok, (l_shoulder[:, 1] + r_shoulder[:, 1]) / 2, math.nan)
+        return (hang, arms_are_straight, there_is_initial_position, has_chin, chin[:, 0], chin[:, 1],
+                chin_is_over_wrists_level, distances_between_wrists_and_chin, wrists_y, shoulders_y)
+
+    def _qualify_frame_features(self, hang, arms_are_straight, there_is_initial_position, has_chin, chin_x, chin_y,
+                                chin_is_over_wrists_level, distance_between_wrists_and_chin, wrists_y, shoulders_y):
+        """Run the qualify_state transitions on precomputed frame geometry."""
+        if not hang:
+            self._inc_failed_phase_define_attempts()
+            self.check_failed_state_detection_attempts_amount()
+            return
+        self._zero_failed_phase_define_attempts()
+        if self._cur_phase == 'beginning':
+            if not arms_are_straight:
+                self._set_cur_phase_as('pulling')
+        elif self._cur_phase == 'pulling':
+            self._add_wrists_y(wrists_y)
+            self._add_shoulders_y(shoulders_y)
+            if chin_is_over_wrists_level:
+                if self.are_shoulders_deviation_greater_than_wrists_one():
+                    self._inc_clean_repeats_amount()
+                    self._set_cur_phase_as('chinning')
+            elif there_is_initial_position:
+                self._set_cur_phase_as('beginning')
+            elif has_chin:
+                self._check_unclean_pull_up_attempt(distance_between_wrists_and_chin)
+        elif self._cur_phase == 'chinning':
+            if not chin_is_over_wrists_level:
+                self._set_cur_phase_as('lowering')
+        elif self._cur_phase == 'lowering':
+            if there_is_initial_position:
+                self._set_cur_phase_as('beginning')
+        elif there_is_initial_position:
+            self._set_cur_phase_as('beginning')
+            self._reset_deviations_calculation()
+            self._set_attempt_positions(distance_between_wrists_and_chin if has_chin else None)
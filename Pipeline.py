@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+
+# marks the end of the stream passing through the stages
+_END = object()
+
+
+class _PipelineAborted(Exception):
+    pass
+
+
+class PipelineStage:
+    """Class keeping a pipeline stage function and its statistics."""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.processed = 0
+        self.busy_time = 0
+        # occupancy of the stage input queue sampled every time an item is taken from it
+        self.queue_occupancy_sum = 0
+        self.queue_occupancy_max = 0
+
+    def get_throughput(self):
+        """Return items per second the stage could process if it never waited for its neighbours."""
+        return self.processed / self.busy_time if self.busy_time else 0
+
+    def get_avg_queue_occupancy(self):
+        return self.queue_occupancy_sum / self.processed if self.processed else 0
+
+
+class Pipeline:
+    """Class running processing stages simultaneously, each one on its own thread, linked by bounded queues.
+
+    Every stage takes items one by one in the same order they are produced by the source,
+    so the order of items is kept. The last stage runs in the calling thread (e.g. to show frames with cv2.imshow).
+    It's worth it when stages release the GIL (OpenCV and OpenPose calls do).
+    """
+
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.source = None
+        self.stages = []
+        self._error = None
+        self._aborted = threading.Event()
+        self._start_time = 0
+        self._total_time = 0
+
+    def set_source(self, name, iterable):
+        """Set an iterable producing pipeline items, it is iterated on its own thread."""
+        self.source = PipelineStage(name, iterable)
+
+    def add_stage(self, name, func):
+        """Add a stage which turns every item by calling func(item)."""
+        self.stages.append(PipelineStage(name, func))
+
+    def _put(self, stage_queue, item):
+        while True:
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._aborted.is_set():
+                    raise _PipelineAborted()
+
+    def _get(self, stage_queue):
+        while True:
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._aborted.is_set():
+                    raise _PipelineAborted()
+
+    def _abort(self, error):
+        if self._error is None:
+            self._error = error
+        self._aborted.set()
+
+    def _run_source(self, output_queue):
+        try:
+            iterator = iter(self.source.func)
+            while True:
+                t = time.perf_counter()
+                item = next(iterator, _END)
+                self.source.busy_time += time.perf_counter() - t
+                if item is _END:
+                    break
+                self.source.processed += 1
+                self._put(output_queue, item)
+            self._put(output_queue, _END)
+        except _PipelineAborted:
+            pass
+        except BaseException as e:
+            self._abort(e)
+
+    def _run_stage(self, stage, input_queue, output_queue):
+        try:
+            while True:
+                occupancy = input_queue.qsize()
+                item = self._get(input_queue)
+                if item is _END:
+                    break
+                stage.queue_occupancy_sum += occupancy
+                stage.queue_occupancy_max = max(stage.queue_occupancy_max, occupancy)
+                t = time.perf_counter()
+                item = stage.func(item)
+                stage.busy_time += time.perf_counter() - t
+                stage.processed += 1
+                if output_queue is not None:
+                    self._put(output_queue, item)
+            if output_queue is not None:
+                self._put(output_queue, _END)
+        except _PipelineAborted:
+            pass
+        except BaseException as e:
+            self._abort(e)
+
+    def run(self):
+        """Pass all source items through the stages and wait for the end.
+
+        An exception raised by any stage stops the whole pipeline and is raised again here.
+        """
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0],), name=self.source.name, daemon=True)]
+        for stage, input_queue, output_queue in zip(self.stages[:-1], queues[:-1], queues[1:]):
+            threads.append(threading.Thread(target=self._run_stage, args=(stage, input_queue, output_queue),
+                                            name=stage.name, daemon=True))
+        self._start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        self._run_stage(self.stages[-1], queues[-1], None)
+        if self._error is not None:
+            # unblock the stages which are still waiting for their neighbours
+            self._aborted.set()
+        for thread in threads:
+            thread.join()
+        self._total_time = time.perf_counter() - self._start_time
+        if self._error is not None:
+            raise self._error
+
+    def report(self):
+        """Return per-stage throughput and input queue occupancy, the bottleneck is the slowest stage."""
+        wall_fps = self.stages[-1].processed / self._total_time if self._total_time else 0
+        lines = [f'Pipeline: {self.stages[-1].processed} items in {self._total_time:.3f} sec ({wall_fps:.1f} items/sec)',
+                 f'{"stage":<12}{"items":>8}{"busy, sec":>12}{"items/sec":>12}{"avg queue":>12}{"max queue":>12}']
+        for stage in [self.source] + self.stages:
+            lines.append(f'{stage.name:<12}{stage.processed:>8}{stage.busy_time:>12.3f}{stage.get_throughput():>12.1f}'
+                         f'{stage.get_avg_queue_occupancy():>12.2f}{stage.queue_occupancy_max:>12}')
+        return '\n'.join(lines)
@@ -1,5 +1,11 @@
+import argparse
+import itertools
+import json
 import os
 from os import walk
+from multiprocessing import Pool
+import cv2
+from JobLedger import JobLedger
 
 try:
     from openpose import pyopenpose as op
@@ -8,49 +14,190 @@ except ImportError as e:
         'Error: OpenPose library could not be found. Did you enable `BUILD_PYTHON` in CMake and have this Python script in the right folder?')
     raise e
 
-# the directory containing video files for preprocessing
-queue_dir = '/home/algernon/samba/video_queue/queue'
-# the directory in which will be placed source video files
-# from the queue_dir together with json files after preprocesing
-input_dir = '/home/algernon/samba/video_queue/input'
-# the directory containing pretrained models using by OpenPose
-models_dir = 'models'
+# the OpenPose wrapper and the ledger connection of a worker process, they live as long as the process
+_open_pose = None
+_ledger = None
 
-input_videos = []
-for _, _, f_names in walk(queue_dir):
-    input_videos.extend(f_names)
-    break
-
-for input_video in input_videos:
-    full_input_video_name = os.path.join(queue_dir, input_video)
-    output_video_dir = os.path.join(input_dir, input_video.split('.')[0])
-    try:
-        os.mkdir(output_video_dir)
-    except OSError:
-        print(f"Creation of the directory {output_video_dir} failed")
 
+def _init_worker(models_dir, ledger_file_name, max_people=1):
+    """Start one long-lived OpenPose wrapper per worker process."""
+    global _open_pose, _ledger
     params = dict()
-    # we want to detect key points only for one person(athlete)
-    params['number_people_max'] = 1
-    # it will print on the command line every `verbose` frames
-    params['cli_verbose'] = 100
+    # key points are detected for one person (athlete) unless several athletes are tracked
+    params['number_people_max'] = max_people
     # the following two params disable video displaying
     params['render_pose'] = 0
     params['display'] = 0
-    # the directory to write OpenPose output in JSON format
-    params['write_json'] = os.path.join(output_video_dir, f'{input_video.split(".")[0]}_json')
-    # use a video file instead of the camera
-    params['video'] = full_input_video_name
     # th folder path (absolute or relative) where the models (pose, face, ...) are located
     params["model_folder"] = models_dir
 
+    _open_pose = op.WrapperPython()
+    _open_pose.configure(params)
+    _open_pose.start()
+    _ledger = JobLedger(ledger_file_name)
+
+
+def _write_json_frame(json_dir, video_name, frame_num, pose_keypoints):
+    """Write key points of a frame in the OpenPose json format.
+
+    The file is renamed into place only when it is completely written, so after a crash
+    every file in the directory is a finished frame.
+    """
+    people = []
+    if pose_keypoints is not None and pose_keypoints.ndim == 3:
+        people = [{'person_id': [-1], 'pose_keypoints_2d': person_keypoints.reshape(-1).tolist()}
+                  for person_keypoints in pose_keypoints]
+    file_name = os.path.join(json_dir, f'{video_name}_{frame_num:012d}_keypoints.json')
+    with open(f'{file_name}.tmp', 'w') as json_data:
+        json.dump({'version': 1.3, 'people': people}, json_data)
+    os.replace(f'{file_name}.tmp', file_name)
+
+
+def _preprocess_video(queue_dir, input_dir, input_video):
+    """Write OpenPose key points of every frame of a queued video and move the video to the input directory.
+
+    If the json directory already contains frames from an interrupted run, the processing resumes after them.
+    :return: the video name and an error message (None on success)
+    """
+    _ledger.set_running(input_video)
+    video_name = input_video.split('.')[0]
+    full_input_video_name = os.path.join(queue_dir, input_video)
+    output_video_dir = os.path.join(input_dir, video_name)
+    # the directory to write OpenPose output in JSON format
+    json_dir = os.path.join(output_video_dir, f'{video_name}_json')
     try:
-        open_pose = op.WrapperPython(3)
-        open_pose.configure(params)
-        open_pose.execute()
-        os.rename(full_input_video_name, os.path.join(output_video_dir, input_video))
+        os.makedirs(json_dir, exist_ok=True)
+        done_frames = sum(1 for f_name in os.listdir(json_dir) if f_name.endswith('.json'))
+        cap = cv2.VideoCapture(full_input_video_name)
+        if not cap.isOpened():
+            raise IOError(f"{full_input_video_name} can't be opened.")
+        # skip already processed frames by decoding them, seeking isn't frame-accurate for all codecs
+        for _ in range(done_frames):
+            cap.grab()
+
+        frame_num = done_frames
+        while True:
+            has_frame, frame = cap.read()
+            if not has_frame:
+                break
+            datum = op.Datum()
+            datum.cvInputData = frame
+            _open_pose.emplaceAndPop([datum])
+            _write_json_frame(json_dir, video_name, frame_num, datum.poseKeypoints)
+            frame_num += 1
+        cap.release()
 
+        os.rename(full_input_video_name, os.path.join(output_video_dir, input_video))
     except Exception as e:
-        print(e)
+        _ledger.set_failed(input_video, str(e))
+        return input_video, str(e)
+    _ledger.set_done(input_video)
+    return input_video, None
+
+
+def _star_preprocess_video(job):
+    return _preprocess_video(*job)
+
+
+class Preprocessor:
+    """Class running OpenPose on queued videos in worker processes with resumable work tracking."""
+
+    LEDGER_FILE_NAME = 'preprocessor_ledger.sqlite3'
+
+    def __init__(self):
+        # the directory containing video files for preprocessing
+        self.queue_dir = ""
+        # the directory in which will be placed source video files
+        # from the queue_dir together with json files after preprocesing
+        self.input_dir = ""
+        # the directory containing pretrained models using by OpenPose
+        self.models_dir = 'models'
+        self.workers = 1
+        self.ledger_file_name = ""
+        self.retry_failed = False
+        self.max_people = 1
+        self.parse_cmd_line()
+
+    def parse_cmd_line(self):
+        """Extract arguments from the command line."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument('queue_dir', help='directory containing video files for preprocessing')
+        parser.add_argument('input_dir', help='directory in which will be placed source videos together with '
+                                              'json files after preprocessing')
+        parser.add_argument('--models-dir', dest='models_dir', default='models',
+                            help='directory containing pretrained models using by OpenPose')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='amount of worker processes, each one keeps its own OpenPose instance')
+        parser.add_argument('--ledger', default=None,
+                            help=f'work tracking database (input_dir/{Preprocessor.LEDGER_FILE_NAME} by default)')
+        parser.add_argument('--retry-failed', dest='retry_failed', action='store_true',
+                            help='process again the videos which failed previously')
+        parser.add_argument('--max-people', dest='max_people', type=int, default=1,
+                            help='write key points of up to this amount of people (for tracking several athletes)')
+        args = parser.parse_args()
+
+        self.queue_dir = args.queue_dir
+        if not os.path.isdir(self.queue_dir):
+            raise FileNotFoundError("Queue directory not found.")
+        self.input_dir = args.input_dir
+        if not os.path.isdir(self.input_dir):
+            raise FileNotFoundError("Input directory not found.")
+        self.models_dir = args.models_dir
+        if args.workers < 1:
+            raise ValueError("Workers amount must be a positive number.")
+        self.workers = args.workers
+        self.ledger_file_name = args.ledger or os.path.join(self.input_dir, Preprocessor.LEDGER_FILE_NAME)
+        self.retry_failed = args.retry_failed
+        if args.max_people < 1:
+            raise ValueError("Max people amount must be a positive number.")
+        self.max_people = args.max_people
+
+    def queue_videos(self, ledger):
+        """Register new videos of the queue directory and queue again the unfinished ones."""
+        for _, _, f_names in walk(self.queue_dir):
+            for input_video in f_names:
+                input_stat = os.stat(os.path.join(self.queue_dir, input_video))
+                if ledger.add(input_video, input_stat.st_size, input_stat.st_mtime_ns):
+                    self.move_results_aside(input_video)
+            break
+        ledger.requeue_unfinished(self.retry_failed)
+        # the videos which have disappeared from the queue directory can't be processed
+        return [input_video for input_video in ledger.get_videos(JobLedger.QUEUED)
+                if os.path.isfile(os.path.join(self.queue_dir, input_video))]
+
+    def move_results_aside(self, input_video):
+        """Rename the results of an earlier video with the name of a new one, so they are neither
+        overwritten by the new video nor resumed as its key points."""
+        output_video_dir = os.path.join(self.input_dir, input_video.split('.')[0])
+        if not os.path.isdir(output_video_dir):
+            print(f'{input_video} has changed, it is processed again.')
+            return
+        for num in itertools.count(1):
+            previous_output_video_dir = f'{output_video_dir}_previous{num}'
+            if not os.path.exists(previous_output_video_dir):
+                break
+        os.rename(output_video_dir, previous_output_video_dir)
+        print(f'{input_video} has changed, it is processed again, the former results are moved '
+              f'to {previous_output_video_dir}.')
+
+    def start(self):
+        ledger = JobLedger(self.ledger_file_name)
+        input_videos = self.queue_videos(ledger)
+        print(f'{len(input_videos)} videos are queued.')
+
+        with Pool(self.workers, initializer=_init_worker, initargs=(self.models_dir, self.ledger_file_name,
+                                                                       self.max_people)) as pool:
+            jobs = [(self.queue_dir, self.input_dir, input_video) for input_video in input_videos]
+            for input_video, error in pool.imap_unordered(_star_preprocess_video, jobs):
+                print(f'{input_video}: {"failed: " + error if error else "done"}')
+
+        for video, (state, attempts, error) in ledger.get_states().items():
+            if state != JobLedger.DONE:
+                print(f'{video}: {state} after {attempts} attempts{": " + error if error else ""}')
+        ledger.close()
+
 
-print("Preprocessor finished.")
+if __name__ == '__main__':
+    preprocessor = Preprocessor()
+    preprocessor.start()
+    print("Preprocessor finished.")
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class _NullStage:
+    """Context manager doing nothing, it's returned by a disabled profiler."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _StageTimer:
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._profiler.add(self._name, self._start, time.perf_counter() - self._start)
+        return False
+
+
+class Profiler:
+    """Class timing processing stages of every frame.
+
+    Every stage call is recorded as a span, so per-stage percentiles and a Chrome trace
+    (chrome://tracing or https://ui.perfetto.dev) can be built at the end of the run.
+    A disabled profiler returns a shared do-nothing context manager, so it costs one method call per stage.
+    """
+
+    EXPORT_FORMATS = ('json', 'chrome')
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        # (stage name, start, duration, thread id) of every stage call
+        self._spans = []
+        self._start_time = time.perf_counter()
+
+    def stage(self, name):
+        """Return a context manager timing the code inside it as the given stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def add(self, name, start, duration):
+        """Record a stage call measured with time.perf_counter."""
+        if self.enabled:
+            # list.append is atomic, so pipeline threads can record spans without a lock
+            self._spans.append((name, start, duration, threading.get_ident()))
+
+    def get_stats(self):
+        """Return a dict mapping stage names to calls amount, total, mean, p50, p95, p99 and max time in ms."""
+        durations = {}
+        for name, _, duration, _ in self._spans:
+            durations.setdefault(name, []).append(duration)
+        stats = {}
+        for name, stage_durations in durations.items():
+            stage_durations = np.array(stage_durations) * 1000
+            p50, p95, p99 = np.percentile(stage_durations, [50, 95, 99])
+            stats[name] = {'calls': len(stage_durations), 'total_ms': float(stage_durations.sum()),
+                           'mean_ms': float(stage_durations.mean()), 'p50_ms': float(p50), 'p95_ms': float(p95),
+                           'p99_ms': float(p99), 'max_ms': float(stage_durations.max())}
+        return stats
+
+    def report(self):
+        """Return a table of per-stage statistics sorted by total time."""
+        stats = sorted(self.get_stats().items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        lines = [f'{"stage":<16}{"calls":>8}{"total, ms":>12}{"p50, ms":>10}{"p95, ms":>10}{"p99, ms":>10}'
+                 f'{"max, ms":>10}']
+        for name, stage_stats in stats:
+            lines.append(f'{name:<16}{stage_stats["calls"]:>8}{stage_stats["total_ms"]:>12.1f}'
+                         f'{stage_stats["p50_ms"]:>10.3f}{stage_stats["p95_ms"]:>10.3f}{stage_stats["p99_ms"]:>10.3f}'
+                         f'{stage_stats["max_ms"]:>10.3f}')
+        return '\n'.join(lines)
+
+    def get_chrome_trace(self):
+        """Return spans as complete events of the Chrome trace event format."""
+        pid = os.getpid()
+        return {'traceEvents': [{'name': name, 'ph': 'X', 'pid': pid, 'tid': thread_id,
+                                 'ts': (start - self._start_time) * 1e6, 'dur': duration * 1e6}
+                                for name, start, duration, thread_id in self._spans],
+                'displayTimeUnit': 'ms'}
+
+    def save(self, file_name, export_format='json'):
+        """Save per-stage statistics (json) or all spans as a Chrome trace (chrome)."""
+        if export_format == 'json':
+            data = self.get_stats()
+        elif export_format == 'chrome':
+            data = self.get_chrome_trace()
+        else:
+            raise ValueError(f"Unknown profile format {export_format}.")
+        with open(file_name, 'w') as profile_data:
+            json.dump(data, profile_data)
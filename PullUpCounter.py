@@ -2,6 +2,10 @@ import sys
 from sys import platform
 from PhaseQualifier import PhaseQualifier
 from VideoProcessor import VideoProcessor
+from KeypointAnalyzer import KeypointAnalyzer
+from Profiler import Profiler
+from Checkpointer import Checkpointer
+from KeypointCache import KeypointCache
 import os
 import argparse
 import time
@@ -12,43 +16,153 @@ dir_path = os.path.dirname(os.path.realpath(__file__))
 class PullUpCounter:
     """The general class for launching the pull ups counter."""
 
-    def __init__(self):
+    REQUIRED_POINTS = {"Nose": 0, "Neck": 1, "RShoulder": 2, "RElbow": 3, "RWrist": 4, "LShoulder": 5, "LElbow": 6,
+                       "LWrist": 7, "MidHip": 8, "RHip": 9, "RKnee": 10, "RAnkle": 11, "LHip": 12, "LKnee": 13,
+                       "LAnkle": 14, "REar": 17, "LEar": 18}
+
+    REQUIRED_PAIRS = (
+        ['Neck', 'RShoulder'], ['Neck', 'LShoulder'], ['RShoulder', 'RElbow'], ['LShoulder', 'LElbow'],
+        ['RElbow', 'RWrist'], ['LElbow', 'LWrist'],
+        ['Neck', 'MidHip'],
+        ['MidHip', 'LHip'], ['MidHip', 'RHip'], ['RHip', 'RKnee'], ['LHip', 'LKnee'], ['LKnee', 'LAnkle'],
+        ['RKnee', 'RAnkle'])
+
+    def __init__(self, args=None):
         self.input_file = ""
         self.short_input_filename = ""
         self.output_dir = ""
         self.json_dir = ""
         self.use_raw_data = False
+        self.preview_every = 1
+        self.pipelined = False
+        self.queue_size = 8
+        self.infer_every = 1
+        self.adaptive_velocity = None
+        self.inference_height = None
+        self.max_people = 1
+        self.checkpoint_every = 0
+        self.restart = False
+        self.workers = 1
+        self.keypoint_cache_dir = None
+        self.keypoint_cache_size = KeypointCache.DEFAULT_MAX_SIZE
+        self.no_render = False
+        self.report_format = 'json'
+        self.profile_file = None
+        self.profile_format = 'json'
 
         self.video_writer = None
         self.audio_writer = None
-        self.required_points = {"Nose": 0, "Neck": 1, "RShoulder": 2, "RElbow": 3, "RWrist": 4, "LShoulder": 5,
-                                "LElbow": 6,
-                                "LWrist": 7, "MidHip": 8, "RHip": 9, "RKnee": 10, "RAnkle": 11, "LHip": 12, "LKnee": 13,
-                                "LAnkle": 14, "REar": 17, "LEar": 18}
-
-        self.required_pairs = (
-            ['Neck', 'RShoulder'], ['Neck', 'LShoulder'], ['RShoulder', 'RElbow'], ['LShoulder', 'LElbow'],
-            ['RElbow', 'RWrist'], ['LElbow', 'LWrist'],
-            ['Neck', 'MidHip'],
-            ['MidHip', 'LHip'], ['MidHip', 'RHip'], ['RHip', 'RKnee'], ['LHip', 'LKnee'], ['LKnee', 'LAnkle'],
-            ['RKnee', 'RAnkle'])
+        self.required_points = PullUpCounter.REQUIRED_POINTS
+        self.required_pairs = PullUpCounter.REQUIRED_PAIRS
 
         self.pose_processor = PhaseQualifier(30, 30, 5, 0.5)
+        self.profiler = None
         self.video_processor = None
         self.output_file_name = ""
-        self.parse_cmd_line()
+        self.parse_cmd_line(args)
+        self.profiler = Profiler(enabled=self.profile_file is not None)
 
-    def parse_cmd_line(self):
-        """Extract arguments from the command line."""
+    def parse_cmd_line(self, args=None):
+        """Extract arguments from the command line.
+
+        :param args: a list of arguments to use instead of sys.argv (to drive the counter from another script)
+        """
         parser = argparse.ArgumentParser()
         parser.add_argument('input_file', help='directory containing source video and json data directory')
         parser.add_argument('output_dir', help='directory in which will be saved the final video')
         parser.add_argument('--use-raw-data', dest='use_raw_data', default=False,
                             help='True or False depending on whether you have json-data in '
                                  'directory with the input video')
-        args = parser.parse_args()
+        parser.add_argument('--headless', action='store_true',
+                            help="don't show processed frames (for machines without a display)")
+        parser.add_argument('--preview-every', dest='preview_every', type=int, default=1,
+                            help='show only every N-th processed frame')
+        parser.add_argument('--pipelined', action='store_true',
+                            help='decode, infer, qualify and encode frames simultaneously on separate threads')
+        parser.add_argument('--queue-size', dest='queue_size', type=int, default=8,
+                            help='max amount of frames waiting between two pipeline stages')
+        parser.add_argument('--infer-every', dest='infer_every', type=int, default=1,
+                            help='pass only every N-th frame to OpenPose and interpolate key points of the others '
+                                 '(for high fps videos)')
+        parser.add_argument('--adaptive-velocity', dest='adaptive_velocity', type=float, default=None,
+                            help='with --infer-every, pass every frame to OpenPose while wrists or shoulders '
+                                 'move faster than this amount of pixels per frame (not with --pipelined)')
+        parser.add_argument('--inference-height', dest='inference_height', type=int, default=None,
+                            help='downscale frames passed to OpenPose to this height (e.g. 368), '
+                                 'the output video keeps the native resolution')
+        parser.add_argument('--max-people', dest='max_people', type=int, default=1,
+                            help='track up to this amount of athletes, each one gets their own counter and panel')
+        parser.add_argument('--checkpoint-every', dest='checkpoint_every', type=float, default=0,
+                            help='save the processing state every N seconds of the video, so an interrupted run '
+                                 'is resumed from the last checkpoint (0 disables checkpoints)')
+        parser.add_argument('--restart', action='store_true',
+                            help='process the video from the beginning even if there is a checkpoint')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='with --use-raw-data, render the video in this amount of chunks simultaneously '
+                                 'in worker processes')
+        parser.add_argument('--keypoint-cache', dest='keypoint_cache_dir', default=KeypointCache.DEFAULT_DIR,
+                            help='directory where OpenPose key points are cached, so the same video '
+                                 'is passed to OpenPose only once')
+        parser.add_argument('--no-keypoint-cache', dest='no_keypoint_cache', action='store_true',
+                            help="don't read and write cached key points")
+        parser.add_argument('--keypoint-cache-size', dest='keypoint_cache_size', type=float,
+                            default=KeypointCache.DEFAULT_MAX_SIZE / 1024 ** 2,
+                            help='max size of the key points cache in MB, the least recently used videos are evicted')
+        parser.add_argument('--no-render', dest='no_render', action='store_true',
+                            help='with --use-raw-data, only count reps from json data without decoding the video '
+                                 'and write a report instead of the output video')
+        parser.add_argument('--report-format', dest='report_format', choices=KeypointAnalyzer.REPORT_FORMATS,
+                            default='json', help='format of the --no-render report')
+        parser.add_argument('--profile', dest='profile_file', default=None,
+                            help='time processing stages of every frame and save them to this file')
+        parser.add_argument('--profile-format', dest='profile_format', choices=Profiler.EXPORT_FORMATS,
+                            default='json', help='per-stage p50/p95/p99 statistics (json) or a Chrome trace (chrome)')
+        args = parser.parse_args(args)
 
         self.use_raw_data = args.use_raw_data
+        if args.preview_every < 1:
+            raise ValueError("Preview frequency must be a positive number.")
+        self.preview_every = 0 if args.headless else args.preview_every
+        self.pipelined = args.pipelined
+        if args.queue_size < 1:
+            raise ValueError("Queue size must be a positive number.")
+        self.queue_size = args.queue_size
+        if args.infer_every < 1:
+            raise ValueError("Inference frequency must be a positive number.")
+        self.infer_every = args.infer_every
+        if args.adaptive_velocity is not None and args.adaptive_velocity < 0:
+            raise ValueError("Adaptive velocity must be a non-negative number.")
+        if args.adaptive_velocity is not None and args.pipelined:
+            raise ValueError("Adaptive frame skipping needs the current movement, it can't be used with --pipelined.")
+        self.adaptive_velocity = args.adaptive_velocity
+        if args.inference_height is not None and args.inference_height < 1:
+            raise ValueError("Inference height must be a positive number.")
+        self.inference_height = args.inference_height
+        if args.max_people < 1:
+            raise ValueError("Max people amount must be a positive number.")
+        if args.max_people > 1 and args.infer_every > 1:
+            raise ValueError("Key points of several people can't be interpolated, use --infer-every 1.")
+        self.max_people = args.max_people
+        if args.checkpoint_every < 0:
+            raise ValueError("Checkpoint interval must be a non-negative number.")
+        if args.checkpoint_every and (args.pipelined or args.no_render):
+            raise ValueError("Checkpoints are made only by the serial processing (without --pipelined and --no-render).")
+        self.checkpoint_every = args.checkpoint_every
+        self.restart = args.restart
+        if args.workers < 1:
+            raise ValueError("Workers amount must be a positive number.")
+        if args.workers > 1 and (not args.use_raw_data or args.checkpoint_every or args.no_render):
+            raise ValueError("Video is rendered in chunks only from json data (--use-raw-data) "
+                             "without --checkpoint-every and --no-render.")
+        self.workers = args.workers
+        self.keypoint_cache_dir = None if args.no_keypoint_cache else args.keypoint_cache_dir
+        if args.keypoint_cache_size < 0:
+            raise ValueError("Key points cache size must be a non-negative number.")
+        self.keypoint_cache_size = int(args.keypoint_cache_size * 1024 ** 2)
+        self.no_render = args.no_render
+        self.report_format = args.report_format
+        self.profile_file = args.profile_file
+        self.profile_format = args.profile_format
         self.input_file = args.input_file
         if not os.path.isfile(self.input_file):
             raise FileNotFoundError("Input file not found.")
@@ -61,32 +175,127 @@ class PullUpCounter:
         if not os.path.isdir(self.output_dir):
             raise FileNotFoundError("Output directory not found.")
         self.output_file_name = os.path.join(self.output_dir, f'{self.short_input_filename}')
+        if self.no_render:
+            if self.max_people > 1:
+                raise ValueError("Several athletes can be tracked only with rendering.")
+            if not self.use_raw_data:
+                raise ValueError("Reps can be counted without rendering only from json data (--use-raw-data).")
+            self.output_file_name = os.path.join(
+                self.output_dir, f'{self.short_input_filename.split(".")[0]}_report.{self.report_format}')
 
-    def find_json_dir_by_video_name(self, filename):
+    @staticmethod
+    def find_json_dir_by_video_name(filename):
         """Find a directory consisting json files by video name.
 
         In the directory containing our video file we are trying to find the directory
         having the same name which the video has.
         """
         par_dir = os.path.dirname(filename)
-        possible_json_dir = f'{os.path.join(par_dir, self.short_input_filename.split(".")[0])}_json'
+        possible_json_dir = f'{os.path.join(par_dir, os.path.basename(filename).split(".")[0])}_json'
         return possible_json_dir if os.path.isdir(possible_json_dir) else None
 
+    def create_checkpointer(self):
+        """Create a checkpointer resuming only runs with the same options which affect the processing."""
+        if not self.checkpoint_every:
+            return None
+        checkpoint_file_name = os.path.join(self.output_dir, f'{self.short_input_filename.split(".")[0]}.checkpoint')
+        options = {'use_raw_data': bool(self.use_raw_data), 'infer_every': self.infer_every,
+                   'adaptive_velocity': self.adaptive_velocity, 'inference_height': self.inference_height,
+                   'max_people': self.max_people}
+        checkpointer = Checkpointer(checkpoint_file_name, self.input_file, options, self.checkpoint_every)
+        if self.restart:
+            checkpointer.remove()
+        return checkpointer
+
     def create_video_processor(self):
         self.video_processor = VideoProcessor(self.input_file, self.output_file_name, self.pose_processor,
-                                              self.required_points, self.required_pairs)
+                                              self.required_points, self.required_pairs, self.preview_every,
+                                              self.profiler, self.max_people, self.create_checkpointer(),
+                                              self.workers)
 
     def start(self):
         """Launch the pull up counter in the way depending on the chosen method."""
+        if self.no_render:
+            self.exec_without_render()
+            return
         self.create_video_processor()
 
         if self.use_raw_data:
             self.exec_with_raw_data()
         else:
             self.exec()
+        self.save_profile()
+
+    def save_profile(self):
+        if not self.profiler.enabled:
+            return
+        print(self.profiler.report())
+        self.profiler.save(self.profile_file, self.profile_format)
+        print(f'The profile is saved to {self.profile_file}')
 
     def exec(self):
-        """Process the input video using the OpenPose library."""
+        """Process the input video using the OpenPose library.
+
+        Key points of a video which was already passed to OpenPose with the same params are taken
+        from the cache instead, key points of a new one are cached.
+        """
+        keypoint_cache, cache_key = self.open_keypoint_cache()
+        if keypoint_cache:
+            keypoint_store = keypoint_cache.load(cache_key)
+            if keypoint_store is not None:
+                print(f'Key points are loaded from the cache ({cache_key}).')
+                self.video_processor.process_video_with_keypoints(keypoint_store)
+                return
+            self.video_processor.record_inferred_keypoints()
+
+        op_wrapper = self.start_open_pose(self.max_people)
+        if self.pipelined:
+            self.video_processor.process_video_with_net_pipelined(op_wrapper, self.queue_size, self.infer_every,
+                                                                  self.inference_height)
+        else:
+            self.video_processor.process_video_with_net(op_wrapper, self.infer_every,
+                                                        self.adaptive_velocity, self.inference_height)
+        if keypoint_cache:
+            self.save_keypoints_to_cache(keypoint_cache, cache_key)
+
+    def open_keypoint_cache(self):
+        """Open the key points cache and find the key of the input video.
+
+        :return: the cache and the key, (None, None) if the cache is disabled
+        """
+        if not self.keypoint_cache_dir:
+            return None, None
+        keypoint_cache = KeypointCache(self.keypoint_cache_dir, self.keypoint_cache_size)
+        params = dict(self.get_open_pose_params(self.max_people), inference_height=self.inference_height)
+        return keypoint_cache, keypoint_cache.get_key(self.input_file, params)
+
+    def save_keypoints_to_cache(self, keypoint_cache, cache_key):
+        frames_people_keypoints = self.video_processor.get_inferred_keypoints()
+        # key points of frames which weren't passed to OpenPose are interpolated, they aren't cached
+        if frames_people_keypoints is None:
+            return
+        if keypoint_cache.save(cache_key, frames_people_keypoints, {'video': self.short_input_filename}):
+            print(f'Key points are cached ({cache_key}).')
+        else:
+            print(f"Key points aren't cached, they take more than the max cache size "
+                  f"({keypoint_cache.max_size / 1024 ** 2:.1f} MB).")
+
+    @staticmethod
+    def get_open_pose_params(number_people_max=1):
+        """Return the OpenPose params, they're a part of the key of cached key points too."""
+        params = dict()
+        params["model_folder"] = "models/"
+        params['number_people_max'] = number_people_max
+        params['render_pose'] = 0
+        return params
+
+    @staticmethod
+    def start_open_pose(number_people_max=1):
+        """Import the OpenPose library and start its wrapper.
+
+        :param number_people_max: the max amount of people OpenPose looks for on a frame
+        :return: a started OpenPose wrapper
+        """
         # We moved import statement here to use preprocessed data without existing OpenPose.
         try:
             # Windows Import
@@ -110,23 +319,29 @@ class PullUpCounter:
                 ' in CMake and have this Python script in the right folder?')
             raise e
 
-        params = dict()
-        params["model_folder"] = "models/"
-        params['number_people_max'] = 1
-        params['render_pose'] = 0
-
         op_wrapper = op.WrapperPython()
-        op_wrapper.configure(params)
+        op_wrapper.configure(PullUpCounter.get_open_pose_params(number_people_max))
         op_wrapper.start()
-
-        self.video_processor.process_video_with_net(op_wrapper)
+        return op_wrapper
 
     def exec_with_raw_data(self):
         """Process the input file using prepared json-files."""
-        self.video_processor.process_video_with_raw_data(self.json_dir)
+        if self.workers > 1:
+            self.video_processor.process_video_with_raw_data_in_chunks(self.json_dir)
+        else:
+            self.video_processor.process_video_with_raw_data(self.json_dir)
+
+    def exec_without_render(self):
+        """Count reps using prepared json-files only and write the report."""
+        keypoint_analyzer = KeypointAnalyzer(self.input_file, self.json_dir, self.pose_processor, self.required_points)
+        keypoint_analyzer.analyze()
+        keypoint_analyzer.write_report(self.output_file_name, self.report_format)
+        print(f'Clean reps: {self.pose_processor.clean_repeats}, unclean reps: {self.pose_processor.unclean_repeats}. '
+              f'The report is saved to {self.output_file_name}')
 
 
-pull_up_counter = PullUpCounter()
-t = time.time()
-pull_up_counter.start()
-print(f'Execution time: {time.time() - t:.3} sec')
+if __name__ == '__main__':
+    pull_up_counter = PullUpCounter()
+    t = time.time()
+    pull_up_counter.start()
+    print(f'Execution time: {time.time() - t:.3} sec')
@@ -1,9 +1,10 @@
-import os
 from Timer import Timer
 from PhaseQualifier import PhaseQualifier
 from Drawer import Drawer
 import cv2
+import numpy as np
 from Animator import Animator
+from GlyphCache import GlyphCache
 
 
 class ResultsDrawer:
@@ -23,6 +24,8 @@ class ResultsDrawer:
     MAX_SCORE_VALUE = '999'
     MAX_TIME_VALUE = '99:59'
     LEFT_PADDING = 10
+    INFO_REGION_HEIGHT = 95
+    OVERLAY_ALPHA = 0.7
 
     REPS_LABEL_SIZE = cv2.getTextSize(REPS_LABEL, DEFAULT_FONT, 1, GENERAL_FONT_THICKNESS)[0][0]
     FAILS_LABELS_SIZE = cv2.getTextSize(FAILS_LABEL, DEFAULT_FONT, 1, GENERAL_FONT_THICKNESS)[0][0]
@@ -33,7 +36,7 @@ class ResultsDrawer:
     MAX_VALUE_POSITION_X = LEFT_PADDING + max(REPS_LABEL_SIZE, FAILS_LABELS_SIZE)
     MAX_WIDTH = max(MAX_VALUE_POSITION_X + max(REPS_NUMBERS_SIZE, FAILS_NUMBERS_SIZE), LEFT_PADDING + MAX_TIME_VALUE_SIZE)
 
-    def __init__(self, fps, animation_duration_in_sec=1, animation_min_font_thickness=2, animation_max_font_thickness=9,
+    def __init__(self, fps, phases, animation_duration_in_sec=1, animation_min_font_thickness=2, animation_max_font_thickness=9,
                  animation_min_line_thickness=2, animation_max_line_thickness=13):
         self.old_reps = 0
         self.old_fails = 0
@@ -42,6 +45,7 @@ class ResultsDrawer:
         self.animator = Animator(queue_size, animation_min_font_thickness, animation_max_font_thickness,
                                  animation_min_line_thickness, animation_max_line_thickness)
         self.timer = Timer(fps)
+        self.glyph_cache = GlyphCache(phases, ResultsDrawer.MAX_WIDTH, ResultsDrawer.OVERLAY_ALPHA)
 
     def print_repeats(self, frame, phase_qualifier: PhaseQualifier, x, y):
         now_repeats = phase_qualifier.clean_repeats
@@ -86,8 +90,8 @@ class ResultsDrawer:
         else:
             self.animator.play_unclean_pull_up_font_animation(frame, x, y)
 
-    def print_elapsed_time(self, frame, phase_qualifier, x, y):
-        self.timer.inc()
+    def print_elapsed_time(self, frame, phase_qualifier, x, y, elapsed_frames=1):
+        self.timer.inc(elapsed_frames)
         if self.old_reps == 0 and phase_qualifier.cur_state == 'beginning':
             self.timer.reset()
 
@@ -101,31 +105,27 @@ class ResultsDrawer:
         Drawer.print_message(frame, f'{ResultsDrawer.TIME_LABEL}{mins}:{secs:02}', x, y, thickness=ResultsDrawer.TIME_FONT_THICKNESS,
                              font=ResultsDrawer.DEFAULT_FONT, text_color=Drawer.RED_COLOR)
 
-    @staticmethod
-    def draw_info_region(frame, phase_qualifier: PhaseQualifier):
-        overlay = frame.copy()
-        Drawer.draw_rectangle(overlay, 0, 0, ResultsDrawer.MAX_WIDTH, 95)
-        alpha = 0.7
-        new_frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-        return ResultsDrawer.draw_glyph(new_frame, phase_qualifier)
-
-    @staticmethod
-    def draw_glyph(frame, phase_qualifier: PhaseQualifier):
-        overlay = frame.copy()
-        icons_dir = 'icons'
-        size = ResultsDrawer.MAX_WIDTH
-        alpha = 0.7
-        cur_icon_name = os.path.join(icons_dir, f'{phase_qualifier.cur_state}.png')
-        if not os.path.isfile(os.path.abspath(cur_icon_name)):
-            print(f"{cur_icon_name} isn't found.")
+    def draw_info_region(self, frame, phase_qualifier: PhaseQualifier):
+        """Darken the info panel and put the phase glyph under it.
+
+        Only the panel region is blended, in place, through a view of the frame,
+        so the rest of the frame is neither copied nor touched.
+        """
+        # cv2.rectangle includes its bottom-right corner, hence the extra pixel
+        info_region = frame[:ResultsDrawer.INFO_REGION_HEIGHT + 1, :ResultsDrawer.MAX_WIDTH + 1]
+        alpha = ResultsDrawer.OVERLAY_ALPHA
+        info_region[:] = cv2.addWeighted(np.zeros_like(info_region), alpha, info_region, 1 - alpha, 0)
+        return self.draw_glyph(frame, phase_qualifier)
+
+    def draw_glyph(self, frame, phase_qualifier: PhaseQualifier):
+        cur_phase = phase_qualifier.cur_state
+        if not self.glyph_cache.has_glyph(cur_phase):
             return frame
-        pictogram = cv2.imread(cur_icon_name)
-        pictogram = cv2.resize(pictogram, (size, size), interpolation=cv2.INTER_AREA)
-        init_y = 95
-        Drawer.draw_rectangle(overlay, 0, init_y, size, size)
-        overlay[init_y:init_y + size, :size] = pictogram
-        new_frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-        return new_frame
+        size = ResultsDrawer.MAX_WIDTH
+        init_y = ResultsDrawer.INFO_REGION_HEIGHT
+        glyph_region = frame[init_y:init_y + size + 1, :size + 1]
+        glyph_region[:] = self.glyph_cache.blend(glyph_region, cur_phase)
+        return frame
 
     def draw_line_between_wrists(self, frame, points):
         l_wrist, r_wrist = points['LWrist'], points['RWrist']
@@ -142,12 +142,19 @@ class ResultsDrawer:
             cv2.circle(frame, tuple(phase_qualifier.chin_point), 8, Drawer.BLUE_COLOR, thickness=-1,
                        lineType=cv2.FILLED)
 
-    def display_info(self, frame, phase_qualifier: PhaseQualifier):
-        new_frame = self.draw_info_region(frame, phase_qualifier)
-        self.print_repeats(new_frame, phase_qualifier, ResultsDrawer.LEFT_PADDING, 30)
-        self.print_fails(new_frame, phase_qualifier, ResultsDrawer.LEFT_PADDING, 60)
-        self.print_elapsed_time(new_frame, phase_qualifier, ResultsDrawer.LEFT_PADDING, 90)
-        return new_frame
+    def display_info(self, frame, phase_qualifier: PhaseQualifier, panel_x=0, elapsed_frames=1):
+        """Draw the info panel in the top of the frame.
+
+        :param panel_x: the left border of the panel, athletes panels are drawn side by side
+        :param elapsed_frames: the amount of video frames since the previous call (more than 1 if frames are dropped)
+        :return: the frame
+        """
+        # the panel is drawn through a view of the frame, so its drawing code keeps zero based coordinates
+        panel = self.draw_info_region(frame[:, panel_x:], phase_qualifier)
+        self.print_repeats(panel, phase_qualifier, ResultsDrawer.LEFT_PADDING, 30)
+        self.print_fails(panel, phase_qualifier, ResultsDrawer.LEFT_PADDING, 60)
+        self.print_elapsed_time(panel, phase_qualifier, ResultsDrawer.LEFT_PADDING, 90, elapsed_frames)
+        return frame
 
     @staticmethod
     def display_skeleton(frame, points, required_points):
@@ -0,0 +1,76 @@
+import os
+import subprocess
+from moviepy.config import get_setting
+from AsyncVideoWriter import AsyncVideoWriter
+from FfmpegVideoWriter import FfmpegVideoWriter
+
+
+class SegmentedVideoWriter:
+    """Class encoding frames into a sequence of segment files which are joined into one video at the end.
+
+    A finished segment is completely written, so an interrupted run keeps all segments closed before it
+    and a resumed run continues with the next segment. The segments are joined without re-encoding.
+    """
+
+    def __init__(self, output_file_name, fps, frame_size, segments=None):
+        """
+        :param output_file_name: the file name of the joined video
+        :param segments: file names of segments written by an interrupted run
+        """
+        self.output_file_name = output_file_name
+        self.fps = fps
+        self.frame_size = frame_size
+        self.segments = list(segments or [])
+        self._writer = None
+        self._segment_file_name = None
+
+    def isOpened(self):
+        return self._writer is None or self._writer.isOpened()
+
+    def get_segment_file_name(self, segment_num):
+        file_name, file_extension = os.path.splitext(self.output_file_name)
+        return f'{file_name}_{segment_num:04d}{file_extension}'
+
+    def write(self, frame):
+        if self._writer is None:
+            # a segment left unfinished by an interrupted run is overwritten
+            self._segment_file_name = self.get_segment_file_name(len(self.segments) + 1)
+            self._writer = AsyncVideoWriter(FfmpegVideoWriter(self._segment_file_name, self.fps, self.frame_size))
+        self._writer.write(frame)
+
+    def close_segment(self):
+        """Wait until the written frames are encoded and finish the current segment.
+
+        :return: file names of all finished segments
+        """
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+            self.segments.append(self._segment_file_name)
+        return list(self.segments)
+
+    def release(self):
+        """Finish the current segment and join all segments into the output video."""
+        self.close_segment()
+        if not self.segments:
+            return
+        if len(self.segments) == 1:
+            os.replace(self.segments[0], self.output_file_name)
+        else:
+            self.join_segments()
+        self.segments = []
+
+    def join_segments(self):
+        list_file_name = f'{self.output_file_name}.segments.txt'
+        with open(list_file_name, 'w') as list_data:
+            for segment in self.segments:
+                # the concat demuxer resolves relative names against the list file directory
+                list_data.write(f"file '{os.path.abspath(segment)}'\n")
+        command = [get_setting('FFMPEG_BINARY'), '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                   '-i', list_file_name, '-c', 'copy', self.output_file_name]
+        return_code = subprocess.call(command)
+        os.remove(list_file_name)
+        if return_code:
+            raise IOError(f"ffmpeg failed to join the segments of {self.output_file_name}.")
+        for segment in self.segments:
+            os.remove(segment)
@@ -0,0 +1,137 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from KeypointStore import KeypointStore
+from PhaseQualifier import PhaseQualifier
+from PullUpCounter import PullUpCounter
+
+# key point stores of the labelled sessions, loaded once in every worker process
+_sessions = {}
+
+
+def _load_sessions(json_dirs):
+    for json_dir in json_dirs:
+        _sessions[json_dir] = KeypointStore(json_dir)
+
+
+def _score_params(params):
+    """Count reps of every loaded session with the PhaseQualifier created with the given parameters.
+
+    :param params: PhaseQualifier parameters
+    :return: the parameters and a dict mapping session json directories to (clean reps, unclean reps)
+    """
+    counts = {}
+    for json_dir, keypoint_store in _sessions.items():
+        phase_qualifier = PhaseQualifier(**params)
+        phase_qualifier.qualify_sequence(keypoint_store.keypoints, PullUpCounter.REQUIRED_POINTS,
+                                         keypoint_store.people_present)
+        counts[json_dir] = (phase_qualifier.clean_repeats, phase_qualifier.unclean_repeats)
+    return params, counts
+
+
+class ThresholdSweep:
+    """Class sweeping a grid of PhaseQualifier parameters over labelled sessions.
+
+    No video is decoded, every combination is scored with PhaseQualifier.qualify_sequence
+    over the sessions' json key points, and the combinations are spread over worker processes.
+    """
+
+    GRID_PARAMS = (('arm_angle_threshold', 'arm_angle', [30]),
+                   ('leg_angle_threshold', 'leg_angle', [30]),
+                   ('neck_chin_top_of_head_ratio', 'neck_chin_ratio', [0.5]),
+                   ('chin_to_wrists_raise_ratio_to_start_attempt', 'start_attempt_ratio', [0.7]),
+                   ('chin_to_wrists_raise_ration_to_finish_attempt', 'finish_attempt_ratio', [0.1]))
+
+    def __init__(self):
+        self.labels = {}
+        self.grid = {}
+        self.failed_attempts_amount_threshold = 5
+        self.output_file = ""
+        self.workers = None
+        self.parse_cmd_line()
+
+    def parse_cmd_line(self):
+        """Extract arguments from the command line."""
+        parser = argparse.ArgumentParser()
+        parser.add_argument('labels_file', help='csv file with "session,clean_reps,unclean_reps" rows, where session '
+                                                'is a json data directory (relative to the labels file)')
+        parser.add_argument('output_file', help='csv file in which will be saved the sweep results')
+        for _, arg_name, default in ThresholdSweep.GRID_PARAMS:
+            parser.add_argument(f'--{arg_name.replace("_", "-")}', dest=arg_name, type=float, nargs='+',
+                                default=default, help=f'{arg_name.replace("_", " ")} values to try')
+        parser.add_argument('--failed-attempts', dest='failed_attempts', type=int, default=5,
+                            help='failed attempts amount threshold')
+        parser.add_argument('--workers', type=int, default=None, help='amount of worker processes (all cores by default)')
+        args = parser.parse_args()
+
+        if not os.path.isfile(args.labels_file):
+            raise FileNotFoundError("Labels file not found.")
+        self.labels = self.read_labels(args.labels_file)
+        self.grid = {param: getattr(args, arg_name) for param, arg_name, _ in ThresholdSweep.GRID_PARAMS}
+        self.failed_attempts_amount_threshold = args.failed_attempts
+        self.output_file = args.output_file
+        self.workers = args.workers
+
+    @staticmethod
+    def read_labels(labels_file):
+        """Read labelled clean and unclean reps amounts of sessions.
+
+        :param labels_file: a csv file with session, clean_reps and unclean_reps columns
+        :return: a dict mapping session json directories to (clean reps, unclean reps)
+        """
+        labels_dir = os.path.dirname(os.path.abspath(labels_file))
+        labels = {}
+        with open(labels_file, newline='') as labels_data:
+            for row in csv.DictReader(labels_data):
+                json_dir = os.path.join(labels_dir, row['session'])
+                if not os.path.isdir(json_dir):
+                    raise FileNotFoundError(f"Json directory {json_dir} not found.")
+                labels[json_dir] = (int(row['clean_reps']), int(row['unclean_reps']))
+        return labels
+
+    def generate_params(self):
+        names = list(self.grid)
+        for values in itertools.product(*(self.grid[name] for name in names)):
+            params = dict(zip(names, values))
+            params['failed_attempts_amount_threshold'] = self.failed_attempts_amount_threshold
+            yield params
+
+    def start(self):
+        json_dirs = list(self.labels)
+        # build the key point caches once before the workers memory-map them
+        _load_sessions(json_dirs)
+        with ProcessPoolExecutor(self.workers, initializer=_load_sessions, initargs=(json_dirs,)) as executor:
+            results = list(executor.map(_score_params, self.generate_params(), chunksize=4))
+        self.write_results(results)
+
+    def write_results(self, results):
+        """Write predicted versus labelled reps of every session for every parameters combination."""
+        param_names = [param for param, _, _ in ThresholdSweep.GRID_PARAMS]
+        errors = []
+        with open(self.output_file, 'w', newline='') as output_data:
+            writer = csv.writer(output_data)
+            writer.writerow(param_names + ['session', 'predicted_clean_reps', 'labelled_clean_reps',
+                                           'predicted_unclean_reps', 'labelled_unclean_reps'])
+            for params, counts in results:
+                error = 0
+                for json_dir, (clean_reps, unclean_reps) in counts.items():
+                    labelled_clean_reps, labelled_unclean_reps = self.labels[json_dir]
+                    error += abs(clean_reps - labelled_clean_reps) + abs(unclean_reps - labelled_unclean_reps)
+                    writer.writerow([params[name] for name in param_names] +
+                                    [os.path.basename(json_dir), clean_reps, labelled_clean_reps, unclean_reps,
+                                     labelled_unclean_reps])
+                errors.append((error, params))
+
+        print(f'{len(results)} combinations are scored. The best ones (reps error, parameters):')
+        for error, params in sorted(errors, key=lambda result: result[0])[:5]:
+            print(error, {name: params[name] for name in param_names})
+
+
+if __name__ == '__main__':
+    threshold_sweep = ThresholdSweep()
+    t = time.time()
+    threshold_sweep.start()
+    print(f'Execution time: {time.time() - t:.3} sec')
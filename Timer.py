@@ -5,8 +5,8 @@ class Timer:
         self._stored_time = 0
         self.fps = fps
 
-    def inc(self):
-        self._frames_count += 1
+    def inc(self, frames_amount=1):
+        self._frames_count += frames_amount
         self._cur_time = self._frames_count / self.fps
 
     def store_time(self):
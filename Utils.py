@@ -1,5 +1,6 @@
 import numpy as np
 import math
+from KeypointFrame import KeypointFrame
 
 
 def get_vector_module(vector: list):
@@ -28,26 +29,57 @@ def get_vector_from_points(point_a: list, point_b: list):
 
 
 def extract_required_json_points(points_list, needed_points: dict):
-    points = {}
-    for joint, joint_number in needed_points.items():
-        position = 3 * joint_number
-        x, y = (int(points_list[position]), int(points_list[position + 1]))
-        if 0 < x < 10 and 0 < y < 10:
-            print(x, y)
-        if (x, y) == (0, 0):
-            points[joint] = None
-        else:
-
-            points[joint] = (x, y)
-    return points
+    return KeypointFrame.from_keypoints(points_list, needed_points)
 
 
 def extract_required_points(points_lists, needed_points):
-    points = {}
-    for joint, joint_number in needed_points.items():
-        x, y = (int(x) for x in points_lists[joint_number][:2])
-        if (x, y) == (0, 0):
-            points[joint] = None
-        else:
-            points[joint] = (x, y)
-    return points
+    return KeypointFrame.from_keypoints(points_lists, needed_points)
+
+
+def interpolate_points(start_points, end_points, t):
+    """Return key points between two frames, t is the position between them from 0 to 1.
+
+    If the athlete isn't found in one of the frames, the key points of the nearest frame are returned.
+    """
+    if start_points is None or end_points is None:
+        return start_points if t < 0.5 else end_points
+    return KeypointFrame.interpolate(start_points, end_points, t)
+
+
+def _fix_borderline_degrees(degrees, get_exact_degrees):
+    """Truncate vectorized degrees to ints the same way the scalar functions do.
+
+    NumPy and math functions may differ in the last bit, which matters only when an angle is
+    (almost) a whole number of degrees, so such angles are recomputed by the scalar function.
+    """
+    borderline = np.abs(degrees - np.round(degrees)) < 1e-6
+    angles = np.trunc(degrees)
+    for i in np.flatnonzero(borderline):
+        angles[i] = get_exact_degrees(i)
+    return angles
+
+
+def get_angles_between_vectors(vectors_a, vectors_b):
+    """Vectorized get_angle_between_vectors for arrays of vectors of shape (n, 2)."""
+    vectors_a, vectors_b = np.asarray(vectors_a), np.asarray(vectors_b)
+    vectors_products = np.einsum('ij,ij->i', vectors_a, vectors_b)
+    modules_product = np.power(np.einsum('ij,ij->i', vectors_a, vectors_a).astype(float), 0.5) * np.power(
+        np.einsum('ij,ij->i', vectors_b, vectors_b).astype(float), 0.5)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angles_cos = np.clip(vectors_products / modules_product, -1, 1)
+    degrees = np.degrees(np.arccos(angles_cos))
+    return _fix_borderline_degrees(
+        degrees, lambda i: get_angle_between_vectors(vectors_a[i].tolist(), vectors_b[i].tolist()))
+
+
+def get_angles_between_three_points(points_a, points_b, points_c):
+    """Vectorized get_angle_between_three_points for arrays of points of shape (n, 2)."""
+    points_b = np.asarray(points_b)
+    return get_angles_between_vectors(points_a - points_b, points_b - points_c)
+
+
+def get_slope_angles(deltas_x, deltas_y):
+    """Return int degrees of atan(delta_y / delta_x) for arrays of non-zero deltas_x."""
+    degrees = np.degrees(np.arctan(deltas_y / deltas_x))
+    return _fix_borderline_degrees(
+        degrees, lambda i: int(math.degrees(math.atan(deltas_y[i] / deltas_x[i]))))
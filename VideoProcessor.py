@@ -1,21 +1,52 @@
+import copy
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 import cv2
+import numpy as np
 import Utils
-import os
-import json
+from Athlete import Athlete
+from AthleteTracker import AthleteTracker
 from ResultsDrawer import ResultsDrawer
-from os import walk
+from KeypointStore import KeypointStore
 from PhaseQualifier import PhaseQualifier
 from AudioProcessor import AudioProcessor
+from FfmpegVideoWriter import FfmpegVideoWriter
+from AsyncVideoWriter import AsyncVideoWriter
+from SegmentedVideoWriter import SegmentedVideoWriter
+from Pipeline import Pipeline
+from FrameSource import FrameSource
+from Profiler import Profiler
+
+
+def _render_chunk(input_file_name, output_file_name, json_dir, required_points, required_pairs, max_people,
+                  end_frame_num, state):
+    """Render frames of a video chunk in a worker process starting with the processing state of the chunk start.
+
+    :return: the file name of the rendered chunk (without audio)
+    """
+    state = pickle.loads(state)
+    video_processor = VideoProcessor(input_file_name, output_file_name, state['phase_qualifier'], required_points,
+                                     required_pairs, preview_every=0, max_people=max_people)
+    video_processor.process_chunk_with_raw_data(json_dir, end_frame_num, state)
+    return video_processor.output_file_name_without_sound
 
 
 class VideoProcessor:
     """Class to handle an input video."""
 
+    # the processing state saved in checkpoints and passed to the processes rendering chunks of the video
+    STATE_ATTRIBUTES = ('_frame_num', 'events_labels', '_prev_clean_reps_amount', '_prev_unclean_reps_amount',
+                        'phase_qualifier', '_drawer', '_inferred_frames_amount', '_prev_key_frame_points',
+                        'athletes', '_tracker', '_phase_qualifier_prototype')
+
     def __init__(self, input_file_name, output_file_name_with_sound, phase_definer: PhaseQualifier, required_points,
-                 required_pairs):
+                 required_pairs, preview_every=1, profiler=None, max_people=1, checkpointer=None, workers=1):
         self.output_file_name_with_sound = output_file_name_with_sound
         self.input_file_name = input_file_name
-        self.cap = cv2.VideoCapture(self.input_file_name)
+        # times the processing stages of every frame, a disabled profiler is used by default
+        self.profiler = profiler or Profiler()
+        # frames are decoded on a background thread while the previous ones are processed
+        self.cap = FrameSource(self.input_file_name, profiler=self.profiler)
         self._fps = int(self.cap.get(cv2.CAP_PROP_FPS))
         self.phase_qualifier = phase_definer
         self.required_points = required_points
@@ -25,6 +56,23 @@ class VideoProcessor:
         self._prev_clean_reps_amount = 0
         self._prev_unclean_reps_amount = 0
         self._frame_num = 0
+        # the frames passed to OpenPose and key points of the last one, the others are interpolated
+        self._inferred_frames_amount = 0
+        self._prev_key_frame_points = None
+        # key points of all people found by OpenPose on every frame, they're kept only if it's required
+        self.inferred_keypoints = None
+        # show every N-th processed frame, 0 disables the preview (headless mode)
+        self.preview_every = preview_every
+        # more than one person is tracked, every athlete gets a copy of the untouched phase qualifier
+        self.max_people = max_people
+        self._phase_qualifier_prototype = copy.deepcopy(phase_definer)
+        self.athletes = {}
+        self._tracker = AthleteTracker(max_missed_frames=2 * self._fps)
+        # saves the processing state periodically, so an interrupted run can be resumed
+        self.checkpointer = checkpointer
+        self._next_checkpoint_frame = 0
+        # the amount of processes rendering chunks of the video simultaneously
+        self.workers = workers
 
         cap_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         cap_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
@@ -32,8 +80,15 @@ class VideoProcessor:
 
         output_file_name, output_file_extension = self.output_file_name_with_sound.split('.')
         self.output_file_name_without_sound = f'{output_file_name}_without_audio.{output_file_extension}'
-        self.video_writer = cv2.VideoWriter(self.output_file_name_without_sound, cv2.VideoWriter_fourcc(*"XVID"), fps,
-                                            (cap_width, cap_height))
+        # frames are encoded to H.264 only once, the audio muxing later copies the video stream,
+        # the encoding runs on a background thread while the next frames are processed
+        if self.checkpointer or self.workers > 1:
+            # a checkpoint keeps the finished segments, so the frames written before it aren't encoded again,
+            # chunks rendered in parallel are joined as segments too
+            self.video_writer = SegmentedVideoWriter(self.output_file_name_without_sound, fps, (cap_width, cap_height))
+        else:
+            self.video_writer = AsyncVideoWriter(
+                FfmpegVideoWriter(self.output_file_name_without_sound, fps, (cap_width, cap_height)))
         self.audio_writer = None
 
     def create_audio_writer(self):
@@ -51,20 +106,6 @@ class VideoProcessor:
     def write_frame_to_output(self, frame):
         self.video_writer.write(frame)
 
-    @staticmethod
-    def get_json_files_from_dir(json_dir):
-        """Return all file names from the specified directory.
-
-        :param json_dir: a directory containing json files producing by OpenPose
-        :return: a list of file names
-        """
-        json_files = []
-        for _, _, f_names in walk(json_dir):
-            json_files.extend(f_names)
-            break
-        json_files = sorted(json_files)
-        return json_files
-
     def release_video_cap(self):
         if self.cap:
             self.cap.release()
@@ -73,35 +114,231 @@ class VideoProcessor:
         if self.video_writer:
             self.video_writer.release()
 
+    def is_preview_enabled(self):
+        return self.preview_every > 0
+
     def release_video_tools(self):
-        cv2.destroyAllWindows()
+        if self.is_preview_enabled():
+            cv2.destroyAllWindows()
         self.release_video_cap()
         self.release_video_writer()
 
-    def process_video_with_net(self, op_wrapper):
+    def process_video_with_net(self, op_wrapper, infer_every=1, adaptive_velocity=None, inference_height=None):
         """Create a generator returning processed frames using only an input video.
 
         :param op_wrapper: an initialized open-pose instance to handle frames
+        :param infer_every: pass only every N-th frame to OpenPose and interpolate key points of the frames between
+        :param adaptive_velocity: pass every frame to OpenPose while wrists or shoulders move faster than
+        this amount of pixels per frame (None disables it)
+        :param inference_height: downscale frames passed to OpenPose to this height (None keeps the native one)
         :return: a generator returning processed frames
         """
-        from openpose import pyopenpose as op
         # pass _fps to the ResultsDrawer instance to obtain same animation effect on videos with different _fps
-        self._drawer = ResultsDrawer(self._fps)
+        self._drawer = ResultsDrawer(self._fps, self.phase_qualifier.phases)
+        self.resume_from_checkpoint()
+        # all frames of a segment are held together
+        self.cap.keep_frames(infer_every)
+        for segment in self.read_segments(infer_every, adaptive_velocity):
+            for frame, points in self.infer_segment_points(op_wrapper, segment, inference_height):
+                self._frame_num += 1
+                frame = self.handle_detections(frame, points)
+                self.handle_frame(frame)
+            self.save_checkpoint_if_due()
+        self.release_video_tools()
+        self.print_inferred_frames_amount(infer_every)
+        self.overlay_audio()
+
+    def process_video_with_net_pipelined(self, op_wrapper, queue_size=8, infer_every=1, inference_height=None):
+        """Process an input video like process_video_with_net but with overlapping stages.
+
+        Decoding, pose inference, qualification with rendering and encoding run simultaneously
+        on their own threads linked by bounded queues, frames keep their order.
+        Per-stage throughput and queue occupancy are printed at the end to find the bottleneck stage.
+        There is no adaptive frame skipping, as the decoding stage runs ahead of the qualification
+        and can't see the athlete's current movement.
+
+        :param op_wrapper: an initialized open-pose instance to handle frames
+        :param queue_size: the max amount of frames waiting between two stages, at least one segment is let through
+        :param infer_every: pass only every N-th frame to OpenPose and interpolate key points of the frames between
+        :param inference_height: downscale frames passed to OpenPose to this height (None keeps the native one)
+        """
+        if self.checkpointer:
+            raise ValueError("Checkpoints can't be made while frames are processed in a pipeline.")
+        self._drawer = ResultsDrawer(self._fps, self.phase_qualifier.phases)
+        # frames are views of the capture ring buffer, so the queues are bounded by frames rather than segments
+        # to keep the ring small with long segments
+        queue_segments_amount = max(1, queue_size // infer_every)
+        pipeline = Pipeline(queue_segments_amount)
+        pipeline.set_source('decode', self.read_segments(infer_every))
+        pipeline.add_stage('inference', lambda segment: self.infer_segment_points(op_wrapper, segment,
+                                                                                   inference_height))
+        pipeline.add_stage('qualify', lambda segment: [self._qualify_and_render(*item) for item in segment])
+        # the encoding stage runs in this thread, so the preview window is handled by the main thread
+        pipeline.add_stage('encode', lambda segment: [self.handle_frame(*numbered_frame)
+                                                      for numbered_frame in segment])
+        # segments are held by the source, every stage and every queue between stages
+        self.cap.keep_frames((len(pipeline.stages) * (queue_segments_amount + 1) + 1) * infer_every)
+        try:
+            pipeline.run()
+        finally:
+            self.release_video_tools()
+        print(pipeline.report())
+        self.print_inferred_frames_amount(infer_every)
+        self.overlay_audio()
+
+    def read_frames(self):
         while True:
-            has_frame, frame = self.cap.read()
+            with self.profiler.stage('decode'):
+                has_frame, frame = self.cap.read()
             if not has_frame:
-                break
-            self._frame_num += 1
+                return
+            yield frame
+
+    def read_segments(self, infer_every=1, adaptive_velocity=None):
+        """Split frames into segments, each one ends with a frame which will be passed to OpenPose (a key frame).
+
+        The first segment is only the first frame, the next ones are infer_every frames long
+        or one frame long while the athlete moves faster than adaptive_velocity.
+        The last segment ends with the last frame, so the end of the video is always passed to OpenPose.
+
+        :param infer_every: the segments length
+        :param adaptive_velocity: the wrists or shoulders velocity in pixels per frame to switch to one frame segments
+        :return: a generator returning segments (lists of frames)
+        """
+        segment = []
+        segment_length = 1
+        for frame in self.read_frames():
+            segment.append(frame)
+            if len(segment) < segment_length:
+                continue
+            yield segment
+            segment = []
+            if adaptive_velocity is not None and self.phase_qualifier.get_last_y_velocity() > adaptive_velocity:
+                segment_length = 1
+            else:
+                segment_length = infer_every
+        if segment:
+            yield segment
+
+    def infer_segment_points(self, op_wrapper, segment, inference_height=None):
+        """Infer key points of the segment key frame and interpolate key points of the frames before it.
+
+        :param op_wrapper: an initialized open-pose instance to handle frames
+        :param segment: a list of frames ending with a key frame
+        :param inference_height: downscale the key frame passed to OpenPose to this height (None keeps the native one)
+        :return: a list of (frame, key points or None) pairs for all frames of the segment,
+        key points of all found people (not interpolated) when several people are tracked
+        """
+        key_frame = segment[-1]
+        with self.profiler.stage('inference'):
+            keypoints = self.infer_keypoints_batch(op_wrapper, [key_frame], inference_height)[0]
+        self._inferred_frames_amount += 1
+        if self.inferred_keypoints is not None:
+            self.inferred_keypoints.append(np.array(keypoints, np.float32))
+        if self.max_people > 1:
+            return [(key_frame, keypoints)]
+        # the athlete is the only person OpenPose looks for
+        points = Utils.extract_required_points(keypoints[0], self.required_points) if len(keypoints) else None
+        frames_points = [(frame, Utils.interpolate_points(self._prev_key_frame_points, points, i / len(segment)))
+                         for i, frame in enumerate(segment[:-1], 1)]
+        frames_points.append((key_frame, points))
+        self._prev_key_frame_points = points
+        return frames_points
+
+    def record_inferred_keypoints(self):
+        """Keep key points of all people found by OpenPose on every frame (e.g. to cache them)."""
+        self.inferred_keypoints = []
+
+    def get_inferred_keypoints(self):
+        """Return a list of (people, 25, 3) key points arrays of every frame.
+
+        :return: None if key points aren't recorded or not every frame is passed to OpenPose
+        (frames are skipped with infer_every or the processing is resumed from a checkpoint)
+        """
+        if self.inferred_keypoints is None or len(self.inferred_keypoints) != self._frame_num:
+            return None
+        return self.inferred_keypoints
+
+    def print_inferred_frames_amount(self, infer_every):
+        if infer_every > 1:
+            print(f'{self._inferred_frames_amount} of {self._frame_num} frames are passed to OpenPose.')
+
+    def _qualify_and_render(self, frame, points):
+        self._frame_num += 1
+        frame = self.handle_detections(frame, points)
+        return frame, self._frame_num
+
+    @staticmethod
+    def infer_points_batch(op_wrapper, frames, required_points, inference_height=None):
+        """Return required key points of the athlete found by OpenPose (or None) for every frame.
+
+        All frames are passed to OpenPose in one call, the results keep the order of frames.
+        If inference_height is lower than the frames height, OpenPose gets downscaled frames
+        and the key points are scaled back to the frames coordinates.
+        """
+        datums, scales = VideoProcessor.pass_frames_to_open_pose(op_wrapper, frames, inference_height)
+        return [VideoProcessor.extract_datum_points(datum, required_points, scale)
+                for datum, scale in zip(datums, scales)]
+
+    @staticmethod
+    def infer_keypoints_batch(op_wrapper, frames, inference_height=None):
+        """Return OpenPose key points of all people found on every frame as (people, 25, 3) arrays.
+
+        The key points are scaled back to the frames coordinates like in infer_points_batch.
+        """
+        datums, scales = VideoProcessor.pass_frames_to_open_pose(op_wrapper, frames, inference_height)
+        people_keypoints = []
+        for datum, scale in zip(datums, scales):
+            # OpenPose returns an empty array (or None) when nobody is found
+            if datum.poseKeypoints is None or datum.poseKeypoints.ndim != 3:
+                people_keypoints.append(np.zeros((0, 25, 3), np.float32))
+            elif scale is not None:
+                people_keypoints.append(datum.poseKeypoints * (scale[0], scale[1], 1))
+            else:
+                people_keypoints.append(datum.poseKeypoints)
+        return people_keypoints
+
+    @staticmethod
+    def pass_frames_to_open_pose(op_wrapper, frames, inference_height=None):
+        """Pass all frames to OpenPose in one call.
+
+        :return: processed datums and scale factors mapping their coordinates back to the frames (None if not resized)
+        """
+        from openpose import pyopenpose as op
+        datums = []
+        scales = []
+        for frame in frames:
+            input_frame, scale = VideoProcessor.downscale_frame(frame, inference_height)
             datum = op.Datum()
-            datum.cvInputData = frame
-            op_wrapper.emplaceAndPop([datum])
-            # check whether datum contains person key points (25 points consisting of x, y, probability)
-            if datum.poseKeypoints.size == 75:
-                points = Utils.extract_required_points(datum.poseKeypoints[0], self.required_points)
-                frame = self.handle_points(frame, points)
-            self.handle_frame(frame)
-        self.release_video_tools()
-        self.overlay_audio()
+            datum.cvInputData = input_frame
+            datums.append(datum)
+            scales.append(scale)
+        op_wrapper.emplaceAndPop(datums)
+        return datums, scales
+
+    @staticmethod
+    def downscale_frame(frame, height):
+        """Resize the frame to the given height keeping its aspect ratio, frames which aren't higher are kept.
+
+        :return: the resized frame and (x, y) scale factors to map its coordinates back to the source frame
+        """
+        frame_height, frame_width = frame.shape[:2]
+        if height is None or frame_height <= height:
+            return frame, None
+        width = max(1, round(frame_width * height / frame_height))
+        resized_frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        return resized_frame, (frame_width / width, frame_height / height)
+
+    @staticmethod
+    def extract_datum_points(datum, required_points, scale=None):
+        # check whether datum contains person key points (25 points consisting of x, y, probability)
+        if datum.poseKeypoints.size == 75:
+            keypoints = datum.poseKeypoints[0]
+            if scale is not None:
+                # not found points stay (0, 0)
+                keypoints = keypoints * (scale[0], scale[1], 1)
+            return Utils.extract_required_points(keypoints, required_points)
+        return None
 
     def process_video_with_raw_data(self, json_dir):
         """Create a generator returning processed frames using an input video and json key points.
@@ -109,40 +346,216 @@ class VideoProcessor:
         :param json_dir: a directory name containing json files with key points
         :return: a generator returning processed frames
         """
-        self._drawer = ResultsDrawer(self._fps)
-        json_files = self.get_json_files_from_dir(json_dir)
+        with self.profiler.stage('keypoint_store'):
+            keypoint_store = KeypointStore(json_dir)
+        self.process_video_with_keypoints(keypoint_store)
+
+    def process_video_with_keypoints(self, keypoint_store):
+        """Process an input video using key points which are already found (json or cached ones).
 
-        for filename in json_files:
-            full_filename_path = os.path.join(json_dir, filename)
-            with open(full_filename_path, "r") as json_data:
-                data = json.load(json_data)
+        :param keypoint_store: a key point store having key points of every frame
+        """
+        self._drawer = ResultsDrawer(self._fps, self.phase_qualifier.phases)
+        for frame_num in range(self.resume_from_checkpoint(), len(keypoint_store)):
+            with self.profiler.stage('decode'):
                 has_frame, frame = self.cap.read()
-                if not has_frame:
-                    return
-                self._frame_num += 1
-                # check whether the json file contains person key points (is a person found?)
-                if data['people']:
-                    points_list = data['people'][0]['pose_keypoints_2d']
-                    points = Utils.extract_required_json_points(points_list, self.required_points)
-                    frame = self.handle_points(frame, points)
-                self.handle_frame(frame)
+            if not has_frame:
+                return
+            self._frame_num += 1
+            frame = self.handle_json_frame(frame, keypoint_store, frame_num)
+            self.handle_frame(frame)
+            self.save_checkpoint_if_due()
         self.release_video_tools()
         self.overlay_audio()
 
+    def process_video_with_raw_data_in_chunks(self, json_dir):
+        """Render the video in chunks simultaneously in worker processes and join the chunks.
+
+        The overlays depend on the state of the whole video before a frame, so a fast pass qualifies
+        all frames from json key points first, without decoding and rendering the video,
+        and keeps the processing state at the start of every chunk. Every worker starts from the state
+        of its chunk, so the joined video is the same as the one rendered by a single process.
+
+        :param json_dir: a directory name containing json files with key points
+        """
+        self._drawer = ResultsDrawer(self._fps, self.phase_qualifier.phases)
+        with self.profiler.stage('keypoint_store'):
+            keypoint_store = KeypointStore(json_dir)
+        # the frames amount of the container is often wrong or missing, the key points cover every frame anyway
+        frames_amount = len(keypoint_store)
+        if not frames_amount:
+            raise ValueError(f"There are no key points of {self.input_file_name} frames.")
+        # a short video gets fewer chunks than workers
+        chunk_starts = sorted({frames_amount * chunk_num // self.workers for chunk_num in range(self.workers)})
+        with self.profiler.stage('scan'):
+            states = self.scan_chunk_states(keypoint_store, frames_amount, chunk_starts)
+
+        output_file_name, output_file_extension = self.output_file_name_with_sound.split('.')
+        with self.profiler.stage('render_chunks'), ProcessPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(_render_chunk, self.input_file_name,
+                                       f'{output_file_name}_chunk{chunk_num + 1:04d}.{output_file_extension}',
+                                       json_dir, self.required_points, self.required_pairs, self.max_people,
+                                       end_frame_num, state)
+                       for chunk_num, (end_frame_num, state) in enumerate(zip(chunk_starts[1:] + [frames_amount],
+                                                                              states))]
+            self.video_writer.segments = [future.result() for future in futures]
+        self.release_video_tools()
+        self.overlay_audio()
+
+    def scan_chunk_states(self, keypoint_store, frames_amount, chunk_starts):
+        """Qualify frames from json key points without the video and return the pickled state at every chunk start.
+
+        The overlays are drawn on a small scratch frame instead of the video frames, so the state of the drawers
+        (their timers and animations) changes exactly as it does while the video is rendered.
+        """
+        scratch_frame = np.zeros((ResultsDrawer.INFO_REGION_HEIGHT + ResultsDrawer.MAX_WIDTH + 2,
+                                  ResultsDrawer.MAX_WIDTH + 1, 3), np.uint8)
+        states = []
+        for frame_num in range(frames_amount):
+            if frame_num in chunk_starts:
+                states.append(pickle.dumps(self.get_state(), pickle.HIGHEST_PROTOCOL))
+            self._frame_num += 1
+            self.handle_json_frame(scratch_frame, keypoint_store, frame_num)
+        return states
+
+    def process_chunk_with_raw_data(self, json_dir, end_frame_num, state):
+        """Render frames from the state start frame until end_frame_num (excluding it) without the audio.
+
+        :param json_dir: a directory name containing json files with key points
+        :param end_frame_num: the number of the first frame of the next chunk
+        :param state: the processing state at the chunk start made by get_state
+        """
+        keypoint_store = KeypointStore(json_dir)
+        self.restore_state(state)
+        for frame_num in range(self._frame_num, end_frame_num):
+            has_frame, frame = self.cap.read()
+            if not has_frame:
+                break
+            self._frame_num += 1
+            frame = self.handle_json_frame(frame, keypoint_store, frame_num)
+            self.handle_frame(frame)
+        self.release_video_tools()
+
+    def handle_json_frame(self, frame, keypoint_store, frame_num):
+        """Qualify and render the athletes using json key points of the frame.
+
+        :return: a handled frame
+        """
+        if self.max_people > 1:
+            people_amount = keypoint_store.people_amounts[frame_num]
+            return self.handle_people(frame, keypoint_store.all_people_keypoints[frame_num][:people_amount])
+        # check whether the json file contains person key points (is a person found?)
+        if keypoint_store.people_present[frame_num]:
+            with self.profiler.stage('extract_points'):
+                points = Utils.extract_required_points(keypoint_store.keypoints[frame_num], self.required_points)
+            frame = self.handle_points(frame, points)
+        return frame
+
     def overlay_audio(self):
-        self.create_audio_writer()
-        self.create_audio_events()
-        self.put_audio_on_video()
-        self.delete_audio_writer()
+        if self.max_people > 1:
+            self.merge_athletes_events()
+        with self.profiler.stage('audio'):
+            self.create_audio_writer()
+            self.create_audio_events()
+            self.put_audio_on_video()
+            self.delete_audio_writer()
+        # the output video is complete, there is nothing to resume
+        if self.checkpointer:
+            self.checkpointer.remove()
+
+    def resume_from_checkpoint(self):
+        """Restore the state saved by an interrupted run and continue reading frames after the saved ones.
+
+        :return: the amount of frames processed before the checkpoint (0 if there is no checkpoint)
+        """
+        if not self.checkpointer:
+            return 0
+        state = self.checkpointer.load()
+        if state is not None:
+            self.restore_state(state)
+            self.video_writer.segments = state['segments']
+            print(f'Resuming from frame {self._frame_num} ({self._frame_num / self._fps:.1f} sec).')
+        self._next_checkpoint_frame = self._frame_num + max(1, int(self.checkpointer.interval * self._fps))
+        return self._frame_num
+
+    def get_state(self):
+        return {name: getattr(self, name) for name in VideoProcessor.STATE_ATTRIBUTES}
+
+    def restore_state(self, state):
+        """Restore the processing state and continue reading frames after the processed ones."""
+        for name in VideoProcessor.STATE_ATTRIBUTES:
+            setattr(self, name, state[name])
+        self.cap.seek(self._frame_num)
+
+    def save_checkpoint_if_due(self):
+        if self.checkpointer and self._frame_num >= self._next_checkpoint_frame:
+            self.save_checkpoint()
+
+    def save_checkpoint(self):
+        """Finish the current output segment and save the processing state together with the segments list."""
+        with self.profiler.stage('checkpoint'):
+            state = self.get_state()
+            state['segments'] = self.video_writer.close_segment()
+            self.checkpointer.save(state)
+        self._next_checkpoint_frame = self._frame_num + max(1, int(self.checkpointer.interval * self._fps))
 
     def handle_points(self, frame, points):
-        self.phase_qualifier.qualify_state(points)
+        with self.profiler.stage('qualify_state'):
+            self.phase_qualifier.qualify_state(points)
         self._update_reps_time_labels()
         return self.put_info_on_frame(frame, points)
 
-    def handle_frame(self, frame):
-        self.show_processed_frame(frame)
-        self.write_frame_to_output(frame)
+    def handle_detections(self, frame, detections):
+        """Qualify and render the athlete (key points or None) or all tracked athletes (people key points)."""
+        if self.max_people > 1:
+            return self.handle_people(frame, detections)
+        if detections is not None:
+            frame = self.handle_points(frame, detections)
+        return frame
+
+    def handle_people(self, frame, people_keypoints):
+        """Match people to the tracked athletes, qualify every athlete's state and put their info on the frame.
+
+        :param frame: a frame to be applied
+        :param people_keypoints: a (people, 25, 3) array of OpenPose key points of the people found on the frame
+        :return: a handled frame
+        """
+        with self.profiler.stage('track'):
+            track_ids = self._tracker.update(people_keypoints)
+        frame_width = frame.shape[1]
+        for keypoints, track_id in zip(people_keypoints, track_ids):
+            if track_id is None:
+                continue
+            athlete = self.athletes.get(track_id)
+            if athlete is None:
+                athlete = Athlete(track_id, copy.deepcopy(self._phase_qualifier_prototype), self._fps)
+                self.athletes[track_id] = athlete
+            points = Utils.extract_required_points(keypoints, self.required_points)
+            with self.profiler.stage('qualify_state'):
+                athlete.qualify(points, self._frame_num / self._fps)
+            # the panel follows the athlete, but it's kept inside the frame
+            panel_x = int(self._tracker.get_centroid(track_id)[0]) - ResultsDrawer.MAX_WIDTH // 2
+            panel_x = min(max(panel_x, 0), max(frame_width - ResultsDrawer.MAX_WIDTH - 1, 0))
+            with self.profiler.stage('display_info'):
+                athlete.render(frame, points, self.required_pairs, panel_x)
+        return frame
+
+    def merge_athletes_events(self):
+        """Collect rep events of all athletes for the audio track and print every athlete's result."""
+        self.events_labels = sorted(event for athlete in self.athletes.values() for event in athlete.events_labels)
+        for track_id, athlete in sorted(self.athletes.items()):
+            if athlete.events_labels:
+                print(f'Athlete #{track_id}: clean reps: {athlete.phase_qualifier.clean_repeats}, '
+                      f'unclean reps: {athlete.phase_qualifier.unclean_repeats}')
+
+    def handle_frame(self, frame, frame_num=None):
+        frame_num = self._frame_num if frame_num is None else frame_num
+        if self.is_preview_enabled() and frame_num % self.preview_every == 0:
+            with self.profiler.stage('imshow'):
+                self.show_processed_frame(frame)
+        # the frame is encoded on the writer thread, it's the time of passing the frame to it
+        with self.profiler.stage('write'):
+            self.write_frame_to_output(frame)
 
     def _update_reps_time_labels(self):
         if self._prev_clean_reps_amount != self.phase_qualifier.clean_repeats:
@@ -159,10 +572,12 @@ class VideoProcessor:
         :param points: key points
         :return: a handled frame
         """
-        new_frame = self._drawer.display_info(frame, self.phase_qualifier)
-        self._drawer.display_skeleton(new_frame, points, self.required_pairs)
-        self._drawer.draw_line_between_wrists(new_frame, points)
-        self._drawer.draw_chin_point(new_frame, self.phase_qualifier)
+        with self.profiler.stage('display_info'):
+            new_frame = self._drawer.display_info(frame, self.phase_qualifier)
+        with self.profiler.stage('skeleton'):
+            self._drawer.display_skeleton(new_frame, points, self.required_pairs)
+            self._drawer.draw_line_between_wrists(new_frame, points)
+            self._drawer.draw_chin_point(new_frame, self.phase_qualifier)
         return new_frame
 
     def create_audio_events(self):
@@ -0,0 +1,128 @@
+"""Synthetic pull up sessions: OpenPose key points, OpenPose-format json directories and videos.
+
+The sessions are generated from a seed, so every run (and every commit) is measured on the same data.
+"""
+import json
+import math
+import os
+import subprocess
+import cv2
+import numpy as np
+from moviepy.config import get_setting
+from PullUpCounter import PullUpCounter
+
+# the pose is designed for 1080 px high frames and scaled to other heights
+BASE_HEIGHT = 1080
+
+
+def generate_pose(lift, center_x, scale, sway=0.0):
+    """Return OpenPose key points of an athlete hanging on the bar.
+
+    :param lift: 0 is a dead hang, 1 is the chin slightly above the bar
+    :param center_x: x of the middle between the wrists
+    :param scale: frame height / BASE_HEIGHT
+    :param sway: horizontal body offset in pixels of a 1080 px frame
+    """
+    keypoints = np.zeros((25, 3), np.float32)
+    bar_y = 150
+    shoulders_y = bar_y + 260 * (1 - lift) + 10
+    elbows_dx = 15 + 60 * math.sin(math.pi * min(lift, 1) * 0.9)
+    points = {'LWrist': (90, bar_y), 'RWrist': (-90, bar_y),
+              'LShoulder': (60 + sway, shoulders_y), 'RShoulder': (-60 + sway, shoulders_y),
+              'LElbow': (75 + elbows_dx, (bar_y + shoulders_y) / 2),
+              'RElbow': (-75 - elbows_dx, (bar_y + shoulders_y) / 2),
+              'Neck': (sway, shoulders_y - 5), 'Nose': (sway, shoulders_y - 75),
+              'LEar': (20 + sway, shoulders_y - 80), 'REar': (-20 + sway, shoulders_y - 80),
+              'MidHip': (sway, shoulders_y + 230), 'LHip': (25 + sway, shoulders_y + 230),
+              'RHip': (-25 + sway, shoulders_y + 230), 'LKnee': (28 + sway, shoulders_y + 420),
+              'RKnee': (-28 + sway, shoulders_y + 420), 'LAnkle': (30 + sway, shoulders_y + 600),
+              'RAnkle': (-30 + sway, shoulders_y + 600)}
+    for joint, (x, y) in points.items():
+        keypoints[PullUpCounter.REQUIRED_POINTS[joint]] = (center_x + x * scale, y * scale, 0.9)
+    return keypoints
+
+
+def generate_keypoints(reps=10, fps=30, seed=0, width=1280, height=720, noise=1.0, fail_every=4, dropout=0.0,
+                       no_person=0.0):
+    """Generate key points of a session with clean reps and (every fail_every-th) unclean ones.
+
+    :param noise: standard deviation of the key points noise in pixels
+    :param dropout: share of joints which aren't found
+    :param no_person: share of frames without a person
+    :return: (frames, 25, 3) float32 key points and a mask of frames containing a person
+    """
+    rng = np.random.default_rng(seed)
+    scale = height / BASE_HEIGHT
+    lifts = [0.0] * int(fps * 0.8)
+    for rep in range(reps):
+        top = 0.8 if fail_every and rep % fail_every == fail_every - 1 else 1.05
+        up, down, hold = (int(fps * rng.uniform(*limits)) for limits in ((0.6, 1.0), (0.6, 1.0), (0.2, 0.6)))
+        lifts += list(np.linspace(0, top, up)) + [top] * int(fps * 0.1) + list(np.linspace(top, 0, down)) + [0] * hold
+    keypoints = np.array([generate_pose(lift, width / 2, scale) for lift in lifts])
+    keypoints[..., :2] += rng.normal(0, noise, keypoints[..., :2].shape)
+    keypoints[rng.random(keypoints.shape[:2]) < dropout] = 0
+    people_present = rng.random(len(keypoints)) >= no_person
+    keypoints[~people_present] = 0
+    return keypoints.astype(np.float32), people_present
+
+
+def write_json_dir(keypoints, people_present, json_dir, video_name):
+    """Write key points of every frame as an OpenPose json file."""
+    os.makedirs(json_dir, exist_ok=True)
+    for frame_num, (frame_keypoints, person_is_found) in enumerate(zip(keypoints, people_present)):
+        people = []
+        if person_is_found:
+            people.append({'person_id': [-1], 'pose_keypoints_2d': frame_keypoints.reshape(-1).tolist()})
+        with open(os.path.join(json_dir, f'{video_name}_{frame_num:012d}_keypoints.json'), 'w') as json_data:
+            json.dump({'version': 1.3, 'people': people}, json_data)
+
+
+def draw_frame(frame, keypoints):
+    """Draw the athlete as a stick figure on a plain background and a bar over the wrists."""
+    frame[:] = (90, 110, 130)
+    height, width = frame.shape[:2]
+    thickness = max(2, height // 100)
+    wrists_y = int(keypoints[PullUpCounter.REQUIRED_POINTS['LWrist'], 1])
+    cv2.line(frame, (0, wrists_y), (width, wrists_y), (40, 40, 40), thickness)
+    for joint_a, joint_b in PullUpCounter.REQUIRED_PAIRS:
+        point_a = keypoints[PullUpCounter.REQUIRED_POINTS[joint_a]]
+        point_b = keypoints[PullUpCounter.REQUIRED_POINTS[joint_b]]
+        if point_a[2] and point_b[2]:
+            cv2.line(frame, (int(point_a[0]), int(point_a[1])), (int(point_b[0]), int(point_b[1])),
+                     (200, 170, 150), thickness * 2)
+    return frame
+
+
+def write_video(file_name, keypoints, width, height, fps):
+    """Encode stick figure frames to H.264 with a sine tone audio track, so the audio overlay can be measured."""
+    duration = len(keypoints) / fps
+    temp_file_name = f'{file_name}.tmp'
+    command = [get_setting('FFMPEG_BINARY'), '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps}', '-i', '-',
+               '-f', 'lavfi', '-i', f'sine=frequency=220:sample_rate=44100:duration={duration}',
+               '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-ac', '2',
+               '-shortest', '-f', 'mp4', temp_file_name]
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+    frame = np.empty((height, width, 3), np.uint8)
+    for frame_keypoints in keypoints:
+        encoder.stdin.write(draw_frame(frame, frame_keypoints).data)
+    encoder.stdin.close()
+    if encoder.wait():
+        raise IOError(f"ffmpeg failed to encode {file_name}.")
+    # an interrupted run doesn't leave a video which looks complete
+    os.replace(temp_file_name, file_name)
+
+
+def create_session(fixtures_dir, width=1280, height=720, fps=30, reps=10, seed=0):
+    """Create (once) a video and its json directory laid out as PullUpCounter --use-raw-data expects.
+
+    :return: the video file name and the json directory
+    """
+    video_name = f'session_{width}x{height}_{fps}fps_{reps}reps_{seed}'
+    video_file_name = os.path.join(fixtures_dir, f'{video_name}.mp4')
+    json_dir = os.path.join(fixtures_dir, f'{video_name}_json')
+    if not (os.path.isfile(video_file_name) and os.path.isdir(json_dir)):
+        keypoints, people_present = generate_keypoints(reps, fps, seed, width, height)
+        write_json_dir(keypoints, people_present, json_dir, video_name)
+        write_video(video_file_name, keypoints, width, height, fps)
+    return video_file_name, json_dir
@@ -0,0 +1,55 @@
+"""Compare OpenPose frames per second at different batch sizes and inference heights.
+
+Run from the repository root:
+    python -m benchmarks.inference_benchmark path/to/video.mp4 --batch-sizes 1 2 4 8 --inference-heights 0 368
+"""
+import argparse
+import time
+import cv2
+from PullUpCounter import PullUpCounter
+from VideoProcessor import VideoProcessor
+
+
+def read_frames(video_file, frames_amount):
+    cap = cv2.VideoCapture(video_file)
+    frames = []
+    while len(frames) < frames_amount:
+        has_frame, frame = cap.read()
+        if not has_frame:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def measure_fps(op_wrapper, frames, batch_size, inference_height):
+    t = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        VideoProcessor.infer_points_batch(op_wrapper, frames[i:i + batch_size], PullUpCounter.REQUIRED_POINTS,
+                                          inference_height)
+    return len(frames) / (time.perf_counter() - t)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('video_file', help='video whose frames are passed to OpenPose')
+    parser.add_argument('--frames', type=int, default=64, help='amount of frames inferred per batch size')
+    parser.add_argument('--batch-sizes', dest='batch_sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--inference-heights', dest='inference_heights', type=int, nargs='+', default=[0],
+                        help='heights of frames passed to OpenPose, 0 is the native one')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video_file, args.frames)
+    op_wrapper = PullUpCounter.start_open_pose()
+    # the first call initializes the network, it shouldn't be measured
+    VideoProcessor.infer_points_batch(op_wrapper, frames[:1], PullUpCounter.REQUIRED_POINTS)
+
+    print(f'{"batch size":<12}{"height":>8}{"fps":>10}')
+    for inference_height in args.inference_heights:
+        for batch_size in args.batch_sizes:
+            fps = measure_fps(op_wrapper, frames, batch_size, inference_height or None)
+            print(f'{batch_size:<12}{inference_height or "native":>8}{fps:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Measure the per-frame cost of the info panel compositing.
+
+Run from the repository root:
+    python -m benchmarks.overlay_benchmark
+"""
+import argparse
+import timeit
+import cv2
+import numpy as np
+from Drawer import Drawer
+from PhaseQualifier import PhaseQualifier
+from ResultsDrawer import ResultsDrawer
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def draw_info_region_with_full_frame_copies(frame, pictogram):
+    """Reproduce the former compositing which copied and blended the whole frame twice."""
+    alpha = ResultsDrawer.OVERLAY_ALPHA
+    size = ResultsDrawer.MAX_WIDTH
+    init_y = ResultsDrawer.INFO_REGION_HEIGHT
+
+    overlay = frame.copy()
+    Drawer.draw_rectangle(overlay, 0, 0, size, init_y)
+    frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+
+    overlay = frame.copy()
+    Drawer.draw_rectangle(overlay, 0, init_y, size, size)
+    overlay[init_y:init_y + size, :size] = pictogram
+    return cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+
+
+def check_identical_output(frame, pictogram, drawer, phase_qualifier):
+    """Raise an error if the in place compositing changes any pixel compared to the former one."""
+    expected = draw_info_region_with_full_frame_copies(frame, pictogram)
+    actual = drawer.draw_info_region(frame.copy(), phase_qualifier)
+    different_pixels = np.count_nonzero(np.any(expected != actual, axis=2))
+    if different_pixels:
+        raise ValueError(f"The info panel compositing differs from the former one in {different_pixels} pixels.")
+
+
+def measure(func, repeats):
+    """Return the average time of one call in milliseconds."""
+    return min(timeit.repeat(func, number=repeats, repeat=3)) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=100, help='frames composited per measurement')
+    args = parser.parse_args()
+
+    phase_qualifier = PhaseQualifier(30, 30, 5, 0.5)
+    drawer = ResultsDrawer(30, phase_qualifier.phases)
+    size = ResultsDrawer.MAX_WIDTH
+    pictogram = cv2.resize(cv2.imread(f'icons/{phase_qualifier.cur_state}.png'), (size, size),
+                           interpolation=cv2.INTER_AREA)
+
+    print(f'{"resolution":<12}{"full frame, ms":>16}{"roi, ms":>12}{"speedup":>10}')
+    for name, (width, height) in RESOLUTIONS.items():
+        frame = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        check_identical_output(frame, pictogram, drawer, phase_qualifier)
+        before = measure(lambda: draw_info_region_with_full_frame_copies(frame, pictogram), args.repeats)
+        after = measure(lambda: drawer.draw_info_region(frame, phase_qualifier), args.repeats)
+        print(f'{name:<12}{before:>16.3f}{after:>12.3f}{before / after:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
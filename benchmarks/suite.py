@@ -0,0 +1,195 @@
+"""Measure the hot paths on synthetic sessions and save the results as json to compare them between commits.
+
+Run from the repository root:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --output new.json --compare results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import cv2
+import numpy as np
+import Utils
+from AudioProcessor import AudioProcessor
+from KeypointStore import KeypointStore
+from PhaseQualifier import PhaseQualifier
+from PullUpCounter import PullUpCounter
+from ResultsDrawer import ResultsDrawer
+from benchmarks import fixtures
+
+
+def best_time(func, repeats):
+    """Return the best of several measurements of func() in seconds."""
+    times = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+
+def create_phase_qualifier():
+    return PhaseQualifier(30, 30, 5, 0.5)
+
+
+def measure_qualification(keypoints, people_present, repeats):
+    frames_points = [Utils.extract_required_points(frame_keypoints, PullUpCounter.REQUIRED_POINTS)
+                     for frame_keypoints, person_is_found in zip(keypoints, people_present) if person_is_found]
+
+    def qualify_frames():
+        phase_qualifier = create_phase_qualifier()
+        for points in frames_points:
+            phase_qualifier.qualify_state(points)
+
+    def qualify_sequence():
+        create_phase_qualifier().qualify_sequence(keypoints, PullUpCounter.REQUIRED_POINTS, people_present)
+
+    return {'qualify_state': (len(frames_points) / best_time(qualify_frames, repeats), 'frames/s', True),
+            'qualify_sequence': (len(keypoints) / best_time(qualify_sequence, repeats), 'frames/s', True)}
+
+
+def measure_json_loading(json_dir, repeats):
+    def remove_cache():
+        for suffix in ('_keypoints.npy', '_people.npy', '_all_people_keypoints.npy', '_people_amounts.npy',
+                       '_keypoints.json'):
+            cache_file_name = f'{os.path.normpath(json_dir)}{suffix}'
+            if os.path.isfile(cache_file_name):
+                os.remove(cache_file_name)
+
+    def load_cold():
+        remove_cache()
+        KeypointStore(json_dir)
+
+    def load_warm():
+        keypoint_store = KeypointStore(json_dir)
+        for keypoints, person_is_found in zip(keypoint_store.keypoints, keypoint_store.people_present):
+            if person_is_found:
+                Utils.extract_required_points(keypoints, PullUpCounter.REQUIRED_POINTS)
+
+    frames_amount = len(KeypointStore.get_json_files_from_dir(json_dir))
+    cold_time = best_time(load_cold, repeats)
+    warm_time = best_time(load_warm, repeats)
+    return {'json_load_cold': (frames_amount / cold_time, 'frames/s', True),
+            'json_load_warm': (frames_amount / warm_time, 'frames/s', True)}
+
+
+def measure_rendering(keypoints, people_present, width, height, fps):
+    """Return the mean time of drawing the info panel, the skeleton and the chin point on a frame."""
+    phase_qualifier = create_phase_qualifier()
+    drawer = ResultsDrawer(fps, phase_qualifier.phases)
+    frame = np.empty((height, width, 3), np.uint8)
+    render_time = 0
+    frames_amount = 0
+    for frame_keypoints, person_is_found in zip(keypoints, people_present):
+        if not person_is_found:
+            continue
+        points = Utils.extract_required_points(frame_keypoints, PullUpCounter.REQUIRED_POINTS)
+        phase_qualifier.qualify_state(points)
+        fixtures.draw_frame(frame, frame_keypoints)
+        # the same calls as VideoProcessor.put_info_on_frame
+        t = time.perf_counter()
+        new_frame = drawer.display_info(frame, phase_qualifier)
+        drawer.display_skeleton(new_frame, points, PullUpCounter.REQUIRED_PAIRS)
+        drawer.draw_line_between_wrists(new_frame, points)
+        drawer.draw_chin_point(new_frame, phase_qualifier)
+        render_time += time.perf_counter() - t
+        frames_amount += 1
+    return {'render_frame': (render_time / frames_amount * 1000, 'ms', False)}
+
+
+def measure_audio_overlay(video_file_name, keypoints, people_present, fps, repeats):
+    """Return the time of mixing rep event sounds into the audio track and muxing it with the video."""
+    _, events = create_phase_qualifier().qualify_sequence(keypoints, PullUpCounter.REQUIRED_POINTS, people_present)
+    with tempfile.TemporaryDirectory() as output_dir:
+        processed_video_file_name = os.path.join(output_dir, 'video_without_audio.mp4')
+
+        def overlay_audio():
+            # the processed video is removed by the audio overlay
+            shutil.copyfile(video_file_name, processed_video_file_name)
+            audio_writer = AudioProcessor(video_file_name, processed_video_file_name,
+                                          os.path.join(output_dir, 'video.mp4'))
+            for frame_num, is_clean_rep in events:
+                audio_writer.add_event('Complete' if is_clean_rep else 'Fail', (frame_num + 1) / fps)
+            audio_writer.add_background_audio()
+
+        return {'audio_overlay': (best_time(overlay_audio, repeats), 's', False)}
+
+
+def get_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_file_name):
+    """Print the relative change of every metric against results saved by a previous run."""
+    with open(baseline_file_name) as baseline_data:
+        baseline = json.load(baseline_data)
+    print(f'\nCompared with {baseline["meta"]["commit"]} ({baseline_file_name}):')
+    print(f'{"metric":<20}{"before":>12}{"after":>12}{"change":>10}')
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+        before, after = baseline['results'][name]['value'], result['value']
+        change = (after / before - 1) * 100 if before else 0
+        # a positive change is always an improvement
+        if not result['higher_is_better']:
+            change = -change
+        print(f'{name:<20}{before:>12.3f}{after:>12.3f}{change:>+9.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='benchmark_results.json', help='json file for the results')
+    parser.add_argument('--compare', default=None, help='results of a previous run to compare with')
+    parser.add_argument('--fixtures-dir', dest='fixtures_dir',
+                        default=os.path.join(tempfile.gettempdir(), 'pull_up_benchmark_fixtures'),
+                        help='directory where the synthetic sessions are generated once')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--reps', type=int, default=20, help='amount of pull ups in the session')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help='measurements per metric, the best one is kept')
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures_dir, exist_ok=True)
+    video_file_name, json_dir = fixtures.create_session(args.fixtures_dir, args.width, args.height, args.fps,
+                                                        args.reps, args.seed)
+    keypoints, people_present = fixtures.generate_keypoints(args.reps, args.fps, args.seed, args.width, args.height)
+
+    measurements = {}
+    measurements.update(measure_qualification(keypoints, people_present, args.repeats))
+    measurements.update(measure_json_loading(json_dir, args.repeats))
+    measurements.update(measure_rendering(keypoints, people_present, args.width, args.height, args.fps))
+    measurements.update(measure_audio_overlay(video_file_name, keypoints, people_present, args.fps, args.repeats))
+
+    results = {name: {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+               for name, (value, unit, higher_is_better) in measurements.items()}
+    report = {'meta': {'commit': get_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), 'numpy': np.__version__, 'opencv': cv2.__version__,
+                       'machine': platform.platform(), 'session': {name: getattr(args, name) for name in
+                                                                   ('width', 'height', 'fps', 'reps', 'seed')},
+                       'frames': len(keypoints)},
+              'results': results}
+    with open(args.output, 'w') as output_data:
+        json.dump(report, output_data, indent=2)
+
+    print(f'{"metric":<20}{"value":>12}  unit')
+    for name, result in results.items():
+        print(f'{name:<20}{result["value"]:>12.3f}  {result["unit"]}')
+    print(f'The results are saved to {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare end-to-end fps of the render loop with synchronous and background video encoding.
+
+Run from the repository root:
+    python -m benchmarks.writer_benchmark --resolution 1080p --frames 300
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from AsyncVideoWriter import AsyncVideoWriter
+from FfmpegVideoWriter import FfmpegVideoWriter
+from PhaseQualifier import PhaseQualifier
+from ResultsDrawer import ResultsDrawer
+from benchmarks.overlay_benchmark import RESOLUTIONS
+
+
+def generate_frames(width, height, frames_amount=30):
+    """Return smooth frames with a moving bright block and a little noise, which encode like camera footage."""
+    y, x = np.mgrid[:height, :width]
+    background = np.dstack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)]).astype(np.uint8)
+    frames = []
+    for i in range(frames_amount):
+        frame = background.copy()
+        left = i * width // (2 * frames_amount)
+        frame[height // 4:height * 3 // 4, left:left + width // 4] = 220
+        noise = np.random.randint(-3, 4, frame.shape)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def measure_fps(video_writer, frames, frames_amount, phase_qualifier):
+    """Draw the info panel on every frame and write it, like VideoProcessor does for frames without key points."""
+    drawer = ResultsDrawer(30, phase_qualifier.phases)
+    frame = np.empty_like(frames[0])
+    t = time.perf_counter()
+    for i in range(frames_amount):
+        # stands for decoding of the next frame
+        np.copyto(frame, frames[i % len(frames)])
+        drawer.display_info(frame, phase_qualifier)
+        video_writer.write(frame)
+    video_writer.release()
+    return frames_amount / (time.perf_counter() - t)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resolution', choices=RESOLUTIONS, default='1080p')
+    parser.add_argument('--frames', type=int, default=300, help='amount of encoded frames per measurement')
+    parser.add_argument('--queue-size', dest='queue_size', type=int, default=8,
+                        help='amount of frames waiting for the background encoder')
+    args = parser.parse_args()
+
+    width, height = RESOLUTIONS[args.resolution]
+    frames = generate_frames(width, height)
+    phase_qualifier = PhaseQualifier(30, 30, 5, 0.5)
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file_name = os.path.join(output_dir, 'output.mp4')
+        sync_fps = measure_fps(FfmpegVideoWriter(output_file_name, 30, (width, height)), frames, args.frames,
+                               phase_qualifier)
+        async_fps = measure_fps(AsyncVideoWriter(FfmpegVideoWriter(output_file_name, 30, (width, height)),
+                                                 args.queue_size), frames, args.frames, phase_qualifier)
+
+    print(f'{"writer":<12}{"fps":>10}')
+    print(f'{"sync":<12}{sync_fps:>10.2f}')
+    print(f'{"async":<12}{async_fps:>10.2f}')
+    print(f'speedup: {async_fps / sync_fps:.2f}x')
+
+
+if __name__ == '__main__':
+    main()